@@ -1,24 +1,17 @@
 import sys
 import timeit
-import numpy as np
-import pandas as pd
 from maze import Maze
 from robot import Robot
-from mazeanim import MazeAnimation
+from mazeanim import MazeAnimation, AnimationProcess
+from simulator import Simulator, print_event
+from sweep import iter_sweep, sweep_tasks, trial_seed
+from results import ResultSink, export
+from trialcache import TrialCache
+from trajectory import TraceWriter, TraceFile
+from render import export_trials
 import logging 
 
 
-# global dictionaries for robot movement and sensing
-dir_sensors = {'u': ['l', 'u', 'r'], 'r': ['u', 'r', 'd'],
-               'd': ['r', 'd', 'l'], 'l': ['d', 'l', 'u'],
-               'up': ['l', 'u', 'r'], 'right': ['u', 'r', 'd'],
-               'down': ['r', 'd', 'l'], 'left': ['d', 'l', 'u']}
-dir_move = {'u': [0, 1], 'r': [1, 0], 'd': [0, -1], 'l': [-1, 0],
-            'up': [0, 1], 'right': [1, 0], 'down': [0, -1], 'left': [-1, 0]}
-dir_reverse = {'u': 'd', 'r': 'l', 'd': 'u', 'l': 'r',
-               'up': 'd', 'right': 'l', 'down': 'u', 'left': 'r'}
-
-
 if __name__ == '__main__':
     '''
     This script tests and animate a robot based on the code in robot.py on a 
@@ -37,8 +30,24 @@ if __name__ == '__main__':
         eps_path = "./eps/"
     # store json dataframe
     store_json = True
+    # stream each trial to a json lines file in batches, with resume set
+    # trials already recorded in the file are skipped
+    results_file = "results.jsonl"
+    resume = False
+    batch_size = 100
     # regression test
     regression_test = False
+    # parallel sweep on a pool of worker processes (no output per trial)
+    parallel = False
+    workers = None # None for number of CPUs
+    chunksize = None # None for about four chunks per worker
+    # base of the deterministic per-trial seeds, None for unseeded robots
+    base_seed = None
+    # on-disk cache of seeded trial results, bypassed for animation and
+    # logging as cached trials are not simulated
+    bypass_cache = False
+    cache_dir = ".trial_cache"
+    cache_size = 64 * 2**20
     
     # enable debug logging
     debug_logging = False
@@ -52,6 +61,29 @@ if __name__ == '__main__':
         file_handler.setFormatter(formatter)
         logger.addHandler(file_handler)
 
+    # record the trajectory of every trial in a trace file for replay with
+    # mazeanim.py, e.g. "traces.npz", recorded trials are not cached
+    trace_file = None
+    # render the recorded trials headless as png, ppm or svg images to
+    # render_dir, e.g. "renders"
+    render_dir = None
+    render_format = "png"
+
+    # animation frames: the screen is updated after every anim_frame_skip
+    # moves or at most anim_fps times per second, anim_final_only draws
+    # run1 only once it is finished
+    anim_frame_skip = 1
+    anim_fps = None
+    anim_final_only = False
+    # draw in a separate animation process fed by a queue of at most
+    # anim_queue_size moves, anim_policy "block" waits for the animation if
+    # the queue is full, "drop" skips moves. anim_pace limits the simulation
+    # to a number of moves per second, e.g. 20
+    anim_process = False
+    anim_queue_size = 1000
+    anim_policy = "block"
+    anim_pace = None
+
     # default single test configuration
     mazefiles = ['test_maze_01.txt']
     animation = False
@@ -74,13 +106,12 @@ if __name__ == '__main__':
         animation = False
         attempts = 1
 
-    print("Following will be tested:\n","Maze:",mazefiles, ", Animation:", animation,", Run1 algorithm:",algs)
-
-    # results columns for dataframe  
-    pdcols = ['Alg','Trip','Maze', 'Run1', 'Run2', 'Score', 'Coverage']
+    if parallel:
+        animation = False
+        if base_seed is None:
+            base_seed = 0
 
-    # row dataframe
-    stats = []
+    print("Following will be tested:\n","Maze:",mazefiles, ", Animation:", animation,", Run1 algorithm:",algs)
 
     # For runtime calculation 
     total_trips = len(mazefiles) * len(algs)* attempts
@@ -92,172 +123,127 @@ if __name__ == '__main__':
     train_score_mult = 1/30.
 
 
-    # Loop for executing single or multiple tests and each will trigger run1
-    # and run2 robot
-    for maze in mazefiles:
-        testmaze = Maze(maze)
-        tablenodes = np.full((1, testmaze.dim, testmaze.dim), 0, dtype=int)
-        for alg in algs:
-            algtrip = 0
-            for eval_run in range(attempts):
-            # testrobot = Robot(testmaze.dim)
-                #trip counter
-                algtrip += 1
-                trip += 1
-                # table for number of visits
-                tablenodes[0].fill(0)
-                testrobot = Robot(testmaze.dim,alg,logger)
-                # plot walls
-                if animation:
-                    mazeanim = MazeAnimation(testmaze,[0,0],"up", 50)
-                    mazeanim.showmaze()
-                # Record robot performance over two runs.
-                runtimes = []
-                total_time = 0
-                for run in range(2):
-                    print (f"Starting run {run}.")
-                    # Set the robot in the start position. Note that robot
-                    # positionparameters are independent of the robot itself.
-                    robot_pos = {'location': [0, 0], 'heading': 'up'}
-                    tablenodes[0][tuple(robot_pos['location'])] = 1
-                    run_active = True
-                    hit_goal = False
-                    while run_active:
-                        # check for end of time
-                        total_time += 1
-                        if total_time > max_time:
-                            run_active = False
-                            print ("Allotted time exceeded.")
-                            break
-                        # provide robot with sensor information, get actions
-                        
-                        #logging
-                        if debug_logging:
-                            logger.debug(f"Robot new position: {robot_pos['location']}, heading:,{robot_pos['heading']}")
-                        
-                        # provide robot with sensor information, get actions
-                        sensing = [testmaze.dist_to_wall(robot_pos['location'], heading)
-                                for heading in dir_sensors[robot_pos['heading']]]
-                        rotation, movement = testrobot.next_move(sensing)
-                        
-                        # check for a reset
-                        if (rotation, movement) == ('Reset', 'Reset'):
-                            if run == 0 and hit_goal:
-                                run_active = False
-                                runtimes.append(total_time)
-                                print ("Ending first run. Starting next run.")
-                                break
-                            elif run == 0 and not hit_goal:
-                                print ("Cannot reset - robot has not hit goal yet.")
-                                continue
+    cache = TrialCache(cache_dir, cache_size,
+                       bypass=bypass_cache or animation or debug_logging)
+
+    # trials are recorded as they finish, also if the sweep is interrupted
+    sink = ResultSink(results_file, batch_size, resume)
+    if animation and anim_process:
+        mazeanim = AnimationProcess(anim_queue_size, anim_policy, anim_pace)
+    # set once a trial was drawn, all trials may be skipped when resuming
+    animated = False
+    traces = TraceWriter(trace_file, resume) if trace_file else None
+    try:
+        if parallel:
+            # trials on a pool of worker processes, rows in serial loop order
+            tasks = [task for task in sweep_tasks(mazefiles, algs, attempts, base_seed,
+                                                  max_time, train_score_mult, cache)
+                     if not sink.done(*task[:4])]
+            completed = 0
+            for result in iter_sweep(tasks, workers, chunksize, record=traces is not None):
+                task, row = result[:2]
+                sink.write(row, task[3])
+                if traces is not None:
+                    traces.add(result[2], row, task[3])
+                completed += row[4] is not None
+            print("Trips completed:", completed, " from total:", len(tasks))
+        else:
+            # Loop for executing single or multiple tests and each will trigger run1
+            # and run2 robot
+            for maze in mazefiles:
+                testmaze = Maze(maze)
+                for alg in algs:
+                    algtrip = 0
+                    for eval_run in range(attempts):
+                        #trip counter
+                        algtrip += 1
+                        trip += 1
+                        # per-trial seed, same as in the parallel sweep
+                        seed = None
+                        if base_seed is not None:
+                            seed = trial_seed(maze, alg, algtrip, base_seed)
+                        # skip trials recorded before resuming
+                        if sink.done(maze, alg, algtrip, seed):
+                            continue
+                        # plot walls
+                        if animation:
+                            animated = True
+                            if anim_process:
+                                mazeanim.start(testmaze,[0,0],"up", 50, batch=True,
+                                               frame_skip=anim_frame_skip, fps=anim_fps,
+                                               final_only=anim_final_only)
                             else:
-                                print ("Cannot reset on runs after the first.")
-                                continue
-                        # perform rotation
-                        if rotation == -90:
-                            robot_pos['heading'] = dir_sensors[robot_pos['heading']][0]
-                        elif rotation == 90:
-                            robot_pos['heading'] = dir_sensors[robot_pos['heading']][2]
-                        elif rotation == 0:
-                            pass
+                                mazeanim = MazeAnimation(testmaze,[0,0],"up", 50, batch=True,
+                                                         frame_skip=anim_frame_skip, fps=anim_fps,
+                                                         final_only=anim_final_only)
+                                mazeanim.showmaze()
+
+                        def on_event(event, data):
+                            '''
+                            Print simulator messages, log and plot robot movement.
+                            '''
+                            print_event(event, data)
+                            #logging
+                            if debug_logging and event == 'step':
+                                logger.debug(f"Robot new position: {data['location']}, heading:,{data['heading']}")
+                            if animation and event == 'move':
+                                # plot robot movement
+                                mazeanim.plot_move(data['heading'], data['location'], data['run'], data['visits'])
+
+                        # run1 and run2 of a new robot, aborted on invalid moves.
+                        # Seeded trials are taken from the cache if possible.
+                        if cache.bypass or seed is None or traces is not None:
+                            simulator = Simulator(testmaze, lambda dim: Robot(dim, alg, logger, seed=seed),
+                                                  max_time, train_score_mult, strict=True,
+                                                  on_event=on_event, record=traces is not None)
+                            result = simulator.run()
                         else:
-                            print ("Invalid rotation value, no rotation performed.")
-                            run_active = False
-                            break
-                        # perform movement
-                        if abs(movement) > 3:
-                            print ("Movement limited to three squares in a turn.")
-                            run_active = False
-                            break
-                        movement = max(min(int(movement), 3), -3) # fix to range [-3, 3]
-                        while movement:
-                            if movement > 0:
-                                if testmaze.is_permissible(robot_pos['location'], robot_pos['heading']):
-                                    robot_pos['location'][0] += dir_move[robot_pos['heading']][0]
-                                    robot_pos['location'][1] += dir_move[robot_pos['heading']][1]
-                                    
-                                    #logging
-                                    if debug_logging:
-                                        logger.debug(f"robot intermediate pos:, {robot_pos['location']},heading:, {robot_pos['heading']}")
-                                    movement -= 1
-                                    
-                                else:
-                                    print ("Movement stopped by wall.")
-                                    movement = 0
-                            else:
-                                rev_heading = dir_reverse[robot_pos['heading']]
-                                if testmaze.is_permissible(robot_pos['location'], rev_heading):
-                                    robot_pos['location'][0] += dir_move[rev_heading][0]
-                                    robot_pos['location'][1] += dir_move[rev_heading][1]
-                                    #logging
-                                    if debug_logging:
-                                        logger.debug(f"robot intermediate pos:, {robot_pos['location']},heading:, {robot_pos['heading']}")
-                                
-                                    movement += 1
-
-                                else:
-                                    print ("Movement stopped by wall.")
-                                    movement = 0
-                        
-                        #update no of visit
-                        tablenodes[0][tuple(robot_pos['location'])] += 1
-
+                            result = cache.run(testmaze, alg, seed, max_time, train_score_mult,
+                                               on_event=on_event)
                         if animation:
-                            # plot robot movement
-                            mazeanim.plot_move(robot_pos['heading'],robot_pos['location'],run, tablenodes[0][tuple(robot_pos['location'])])
-
-                        goal_bounds = [testmaze.dim/2 - 1, testmaze.dim/2]
-                        if robot_pos['location'][0] in goal_bounds and robot_pos['location'][1] in goal_bounds:
-                            hit_goal = True
-                            if run != 0:
-                                runtimes.append(total_time - sum(runtimes))
-                                run_active = False
-                                print ("Goal found; run {} completed!".format(run))
-                                
-                        
-                # Report score if robot is successful.
-                if len(runtimes) == 2:
-                        print ("Task complete! Score: {:4.3f}".format(runtimes[1] + train_score_mult*runtimes[0]))
-                        #check how many nodes are explored
-                        n_zeros = np.count_nonzero(tablenodes[0] != 0) 
-                        # calculate coverage
-                        coverage = round((n_zeros / (testmaze.dim * testmaze.dim)) * 100, 1)
-                        #calculate score
-                        score = round(runtimes[1] + train_score_mult*runtimes[0],2)
-                        #add results to dataframe
-                        stats.append([alg, algtrip, maze, runtimes[0], runtimes[1], score, coverage])
-                        #print actual attempt/trip
-                        print("Trip:",trip, " from total:", total_trips)
-                        if animation:
-                            # summary text to be plotted
-                            summary_text = {"maze":maze, "alg": alg, "run1":runtimes[0], "coverage":coverage, "run2":runtimes[1], "score":score}
-                            mazeanim.plot_summary(summary_text)
-                            # store eps plot 
-                            if store_plot:
-                                mazeanim.window.getcanvas().postscript(file= eps_path + "attempt" + str(trip) + ".eps")
-                            # do not erase last plot
-                            if(trip != total_trips):
-                                mazeanim.window.clear()
-                                mazeanim.window.reset()
+                            mazeanim.flush()
+                        row = [alg, algtrip, maze, result.run1, result.run2, result.score, result.coverage]
+                        sink.write(row, seed)
+                        if traces is not None:
+                            traces.add(result.trace, row, seed)
+
+                        # Report score if robot is successful.
+                        if result.completed:
+                                #print actual attempt/trip
+                                print("Trip:",trip, " from total:", total_trips)
+                                if animation:
+                                    # summary text to be plotted
+                                    summary_text = {"maze":maze, "alg": alg, "run1":result.run1, "coverage":result.coverage, "run2":result.run2, "score":result.score}
+                                    mazeanim.plot_summary(summary_text)
+                                    # store eps plot 
+                                    if store_plot:
+                                        mazeanim.postscript(eps_path + "attempt" + str(trip) + ".eps")
+                                    # do not erase last plot
+                                    if(trip != total_trips):
+                                        mazeanim.clear()
                         
 
-                # clean up before to next attempt
-                del testrobot
-        # clean up before to next maze
-        del testmaze
-        del tablenodes
+                # clean up before to next maze
+                del testmaze
+    finally:
+        sink.close()
+        if traces is not None:
+            traces.close()
 
     # print runtime
     stop = timeit.default_timer()
     print('Time: ', stop - start)
 
-    # append results to dataframe and store as json file
-    df = pd.DataFrame(stats, columns=pdcols)
-    out = df.to_json(orient='index')
+    # images of the recorded trials
+    if render_dir and trace_file:
+        export_trials(TraceFile(trace_file), render_dir, render_format)
+
+    # export completed trials as dataframe to json file
     if store_json:
-        with open('results.json', 'w') as f:
-            f.write(out)
+        export(results_file, 'results.json')
 
     # close turtle window
-    if animation:
-        mazeanim.window.exitonclick()
\ No newline at end of file
+    if animation and animated:
+        mazeanim.exitonclick()
+    elif animation and anim_process:
+        mazeanim.close()
\ No newline at end of file
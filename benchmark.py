@@ -0,0 +1,254 @@
+import sys
+import os
+import copy
+import json
+import time
+import platform
+import statistics
+import numpy as np
+from maze import Maze
+from robot import Robot, PlanCache, h_cost_table
+from simulator import Simulator
+import mazegen
+
+# bundled mazes and run1 algorithms
+mazefiles = ['test_maze_01.txt', 'test_maze_02.txt', 'test_maze_03.txt', 'test_maze_04.txt',
+             'test_maze_05.txt', 'test_maze_06.txt', 'test_maze_07.txt', 'test_maze_08.txt']
+algs = ["SHORT_100", "SHORT_90", "SHORT_80", "SHORT_70", "SHORT_GOALS",
+        "HEURISTIC_100", "HEURISTIC_90", "HEURISTIC_80", "HEURISTIC_70", "HEURISTIC_GOALS"]
+
+# benchmark sizes per mode: attempts per maze and algorithm, snapshots for
+# robot micro benchmarks, repeats of the other micro benchmarks and the
+# generated maze dimensions of the scaling curve
+modes = {
+    'quick': {'attempts': 1, 'snapshots': 50, 'repeat': 20, 'dims': [16, 32, 64], 'algs': ["SHORT_90", "HEURISTIC_GOALS"]},
+    'full': {'attempts': 5, 'snapshots': 200, 'repeat': 100, 'dims': [16, 32, 64, 128, 256], 'algs': algs},
+}
+
+# relative slowdown reported as regression when comparing to a baseline
+regression_threshold = 0.1
+
+
+def summary(times):
+    '''
+    Returns the statistics of a list of durations in seconds. time is the
+    median and used when comparing to a baseline.
+    '''
+    times = sorted(times)
+    return {
+        'time': statistics.median(times),
+        'mean': statistics.fmean(times),
+        'min': times[0],
+        'p99': times[min(len(times) - 1, int(len(times) * 0.99))],
+        'samples': len(times),
+    }
+
+
+def measure(call, repeat, setup=None):
+    '''
+    Time call(arg) repeat times where arg is returned by setup, which is not
+    timed, and return the summary.
+    '''
+    times = []
+    for i in range(repeat):
+        arg = setup(i) if setup else None
+        start = time.perf_counter()
+        call(arg)
+        times.append(time.perf_counter() - start)
+    return summary(times)
+
+
+class Recorder(object):
+    '''
+    Robot wrapper for the Simulator which stores a copy of the robot and its
+    sensor readings before every step-th next_move during run1.
+    '''
+
+    def __init__(self, robot, step=1):
+        self.robot = robot
+        self.step = step
+        self.calls = 0
+        self.snapshots = []
+
+    def next_move(self, sensors):
+        if not self.robot.run2 and self.calls % self.step == 0:
+            self.snapshots.append((copy.deepcopy(self.robot), list(sensors)))
+        self.calls += 1
+        return self.robot.next_move(sensors)
+
+
+def robot_snapshots(maze, alg, count, seed=0):
+    '''
+    Returns about count snapshots (robot, sensors) spread over run1 and the
+    robot after the trial.
+    '''
+    # first trial to learn the length of run1, the seeded robot repeats it
+    result = Simulator(maze, lambda dim: Robot(dim, alg, seed=seed)).run()
+    recorder = Recorder(Robot(maze.dim, alg, seed=seed), max(1, (result.run1 or 1000) // count))
+    Simulator(maze, lambda dim: recorder).run()
+    return recorder.snapshots[:count], recorder.robot
+
+
+def micro_benchmarks(mode, mazefile='test_maze_03.txt', alg='HEURISTIC_GOALS'):
+    '''
+    Micro benchmarks of maze loading, h-cost generation, find_best_path,
+    update_map and next_move.
+    '''
+
+    config = modes[mode]
+    repeat = config['repeat']
+    results = {}
+
+    results['maze_load'] = measure(lambda arg: Maze(mazefile, cache=False), repeat)
+    Maze(mazefile, cache=True)
+    results['maze_load_cached'] = measure(lambda arg: Maze(mazefile, cache=True), repeat)
+
+    maze = Maze(mazefile)
+    robot = Robot(maze.dim, alg, seed=0)
+    results['generate_h_cost'] = measure(
+        lambda arg: robot.generate_h_cost(robot.goals), repeat,
+        lambda i: h_cost_table.cache_clear())
+
+    snapshots, explored = robot_snapshots(maze, alg, config['snapshots'])
+
+    # search from the start to the goals on the maze known after the trial,
+    # without reusing cached plans
+    explored.plan_cache = PlanCache(0)
+    results['find_best_path'] = measure(
+        lambda arg: explored.find_best_path(explored.start, explored.start_heading, explored.goals),
+        repeat)
+
+    # each snapshot is copied before the timed call as the call changes it
+    def snapshot(i):
+        robot, sensors = snapshots[i % len(snapshots)]
+        return copy.deepcopy(robot), sensors
+    count = len(snapshots)
+    results['update_map'] = measure(lambda arg: arg[0].update_map(arg[1]), count, snapshot)
+    results['next_move'] = measure(lambda arg: arg[0].next_move(arg[1]), count, snapshot)
+
+    return results
+
+
+def trial_benchmark(maze, alg, attempts, max_time=1000):
+    '''
+    Time full two-run trials with seeds 0 to attempts - 1.
+    '''
+    times = []
+    scores = []
+    timesteps = 0
+    for seed in range(attempts):
+        start = time.perf_counter()
+        result = Simulator(maze, lambda dim: Robot(dim, alg, seed=seed), max_time).run()
+        times.append(time.perf_counter() - start)
+        scores.append(result.score)
+        timesteps += (result.run1 or 0) + (result.run2 or 0)
+    stats = summary(times)
+    stats['trials_per_second'] = attempts / sum(times)
+    stats['timesteps'] = timesteps
+    stats['scores'] = scores
+    return stats
+
+
+def macro_benchmarks(mode):
+    '''
+    Full trials per bundled maze and algorithm and the scaling curve over
+    generated maze dimensions.
+    '''
+
+    config = modes[mode]
+    results = {}
+    for mazefile in mazefiles:
+        maze = Maze(mazefile)
+        for alg in config['algs']:
+            results['trial/{}/{}'.format(mazefile, alg)] = trial_benchmark(maze, alg, config['attempts'])
+
+    # time allowed grows with the number of nodes, 1000 for 16 x 16
+    for dim in config['dims']:
+        maze = mazegen.generate(dim, seed=dim, loop_density=0.05)
+        max_time = 1000 * (dim * dim) // 256
+        results['scaling/{}/{}'.format(dim, "HEURISTIC_GOALS")] = trial_benchmark(
+            maze, "HEURISTIC_GOALS", config['attempts'], max_time)
+
+    return results
+
+
+def run(mode='quick'):
+    '''
+    Run all benchmarks and return the results.
+    '''
+    return {
+        'meta': {
+            'mode': mode,
+            'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'processor': platform.processor(),
+        },
+        'micro': micro_benchmarks(mode),
+        'macro': macro_benchmarks(mode),
+    }
+
+
+def compare(results, baseline, threshold=regression_threshold):
+    '''
+    Returns the comparison of the time of each benchmark with the baseline
+    as {name: {'time', 'baseline', 'ratio', 'regression'}}, ratio above 1
+    is slower. Benchmarks missing in either are skipped.
+    '''
+    comparison = {}
+    for group in ('micro', 'macro'):
+        for name, stats in results.get(group, {}).items():
+            base = baseline.get(group, {}).get(name)
+            if not base or not base['time']:
+                continue
+            ratio = stats['time'] / base['time']
+            comparison['{}/{}'.format(group, name)] = {
+                'time': stats['time'],
+                'baseline': base['time'],
+                'ratio': ratio,
+                'regression': ratio > 1 + threshold,
+            }
+    return comparison
+
+
+def print_results(results, comparison=None):
+    '''
+    Print the time of each benchmark and its ratio to the baseline.
+    '''
+    for group in ('micro', 'macro'):
+        for name, stats in results[group].items():
+            line = '{:<50} {:>12.6f} s'.format(group + '/' + name, stats['time'])
+            if comparison and group + '/' + name in comparison:
+                entry = comparison[group + '/' + name]
+                line += '  x{:.2f}{}'.format(entry['ratio'], '  REGRESSION' if entry['regression'] else '')
+            print(line)
+
+
+if __name__ == '__main__':
+    '''
+    This script runs the benchmarks and stores the results as json, all
+    arguments are optional:
+    python benchmark.py mode output baseline
+    e.g. python benchmark.py quick benchmark.json benchmark_baseline.json
+    mode is quick or full. If the baseline file exists the results are
+    compared to it, otherwise the results are stored as baseline.
+    '''
+
+    mode = sys.argv[1] if len(sys.argv) > 1 else 'quick'
+    output = sys.argv[2] if len(sys.argv) > 2 else 'benchmark.json'
+    baseline_file = sys.argv[3] if len(sys.argv) > 3 else 'benchmark_baseline.json'
+
+    results = run(mode)
+    comparison = None
+    if os.path.exists(baseline_file):
+        with open(baseline_file, 'r') as f:
+            comparison = compare(results, json.load(f))
+        results['comparison'] = comparison
+    else:
+        with open(baseline_file, 'w') as f:
+            json.dump(results, f, indent=1)
+
+    print_results(results, comparison)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=1)
@@ -1,7 +1,211 @@
+import os
 import numpy as np
 
+# index of each direction in the run length table
+dir_index = {'u': 0, 'r': 1, 'd': 2, 'l': 3,
+             'up': 0, 'right': 1, 'down': 2, 'left': 3}
+# wall bit of each direction
+dir_int = {'u': 1, 'r': 2, 'd': 4, 'l': 8,
+           'up': 1, 'right': 2, 'down': 4, 'left': 8}
+
+
+def open_runs(walls):
+    '''
+    Returns an array of shape (4, dim, dim) containing for each cell the
+    number of open cells to the nearest wall in direction up, right, down and
+    left. Each run is counted along the rows or columns at once: a cumulative
+    sum of the passable cells minus its value at the last wall.
+    '''
+    runs = np.empty((4,) + walls.shape, dtype=int)
+    # wall bit, axis along the direction and whether the direction goes
+    # towards increasing index
+    for idx, (bit, axis, forward) in enumerate(((1, 1, True), (2, 0, True),
+                                               (4, 1, False), (8, 0, False))):
+        passable = (walls & bit) != 0
+        if forward:
+            passable = np.flip(passable, axis)
+        count = np.cumsum(passable, axis=axis)
+        last_wall = np.maximum.accumulate(np.where(passable, 0, count), axis=axis)
+        run = count - last_wall
+        if forward:
+            run = np.flip(run, axis)
+        runs[idx] = run
+    return runs
+
+
+def sensor_table(runs):
+    '''
+    Returns an array of shape (dim, dim, 4, 3) containing for each cell and
+    heading index the readings of the left, front and right sensor.
+    '''
+    headings = np.arange(4)[:, None]
+    sensors = runs[(headings + np.array([-1, 0, 1])) % 4]
+    return np.ascontiguousarray(sensors.transpose(2, 3, 0, 1)).astype(np.int16)
+
+
+def move_table(runs, max_move=3):
+    '''
+    Returns an array of shape (dim, dim, 4, 2 * max_move + 1) containing for
+    each cell and heading index the number of cells a movement of -max_move
+    to max_move (at index movement + max_move) actually travels before
+    hitting a wall, negative when moving backwards.
+    '''
+    headings = np.arange(4)[:, None]
+    movements = np.arange(-max_move, max_move + 1)
+    # forward moves go along the heading, backward ones the reverse heading
+    direction = np.where(movements > 0, headings, (headings + 2) % 4)
+    moves = np.sign(movements)[:, None, None] * np.minimum(
+        np.abs(movements)[:, None, None], runs[direction])
+    return np.ascontiguousarray(moves.transpose(2, 3, 0, 1)).astype(np.int16)
+
+
+def wall_lines(walls):
+    '''
+    Returns the walls as boolean arrays of the horizontal grid lines, [j, x]
+    is the wall below node (x, j), and of the vertical grid lines, [i, y] is
+    the wall left of node (i, y). Line dim is the top or right border.
+    '''
+    walls = np.asarray(walls)
+    dim = walls.shape[0]
+    horizontal = np.zeros((dim + 1, dim), dtype=bool)
+    horizontal[1:] = (walls & 1 == 0).T
+    horizontal[0] = walls[:, 0] & 4 == 0
+    vertical = np.zeros((dim + 1, dim), dtype=bool)
+    vertical[1:] = walls & 2 == 0
+    vertical[0] = walls[0] & 8 == 0
+    return horizontal, vertical
+
+
+def wall_segments(walls):
+    '''
+    Returns the walls merged into maximal straight runs as an array of line
+    segments (x0, y0, x1, y1) in node units, horizontal segments first. The
+    runs of all grid lines are found at once from the steps of the padded
+    wall lines: a run starts where a line goes from open to wall and ends
+    where it goes back to open.
+    '''
+    segments = []
+    for lines, horizontal in zip(wall_lines(walls), (True, False)):
+        padded = np.pad(lines, ((0, 0), (1, 1))).astype(np.int8)
+        steps = np.diff(padded, axis=1)
+        # starts and ends are found in the same row major order
+        line, start = np.nonzero(steps == 1)
+        end = np.nonzero(steps == -1)[1]
+        if horizontal:
+            segments.append(np.column_stack((start, line, end, line)))
+        else:
+            segments.append(np.column_stack((line, start, line, end)))
+    return np.concatenate(segments)
+
+
+def read_maze(filename):
+    '''
+    Returns the dimension and the array of walls of a maze text file. The
+    first line is the dimension, each subsequent line a column of comma
+    separated wall values.
+    '''
+    with open(filename, 'r') as f_in:
+        # First line should be an integer with the maze dimensions
+        dim = int(f_in.readline())
+        # Subsequent lines describe the permissability of walls
+        try:
+            walls = np.loadtxt(f_in, delimiter=',', dtype=int, ndmin=2)
+        except ValueError:
+            raise Exception('Maze shape does not match dimension attribute!')
+    return dim, walls
+
+
+def wall_errors(walls):
+    '''
+    Returns the list of inconsistent walls as [(x, y), 'v'] for the wall
+    between (x, y) and (x+1, y) and [(x, y), 'h'] for the wall between (x, y)
+    and (x, y+1). Both sides of all walls are compared at once by shifting
+    the wall bit planes, vertical errors are ordered by x, horizontal ones
+    by y.
+    '''
+    vertical = ((walls[:-1, :] & 2) != 0) != ((walls[1:, :] & 8) != 0)
+    horizontal = ((walls[:, :-1] & 1) != 0) != ((walls[:, 1:] & 4) != 0)
+    errors = [[(int(x), int(y)), 'v'] for x, y in np.argwhere(vertical)]
+    errors += [[(int(x), int(y)), 'h'] for y, x in np.argwhere(horizontal.T)]
+    return errors
+
+
+def validate(dim, walls):
+    '''
+    Performs the consistency checks of maze dimensions and wall positioning,
+    prints each inconsistent wall and raises an Exception on errors.
+    '''
+    # Maze dimensions
+    if dim % 2:
+        raise Exception('Maze dimensions must be even in length!')
+    if walls.shape != (dim, dim):
+        raise Exception('Maze shape does not match dimension attribute!')
+
+    # Wall permeability
+    errors = wall_errors(walls)
+    if errors:
+        for cell, wall_type in errors:
+            if wall_type == 'v':
+                cell2 = (cell[0]+1, cell[1])
+                print('Inconsistent vertical wall betweeen {} and {}'.format(cell, cell2))
+            else:
+                cell2 = (cell[0], cell[1]+1)
+                print ('Inconsistent horizontal wall betweeen {} and {}'.format(cell, cell2))
+        raise Exception('Consistency errors found in wall specifications!')
+
+
+# text files below this size are parsed faster than the sidecar is loaded,
+# about the size of an 80 x 80 maze
+cache_min_bytes = 16 * 2**10
+
+
+def cache_file(filename):
+    '''
+    Returns the name of the compiled sidecar of a maze text file.
+    '''
+    return filename + '.npz'
+
+
+def load_cache(filename, stat):
+    '''
+    Returns the walls of the sidecar of a maze text file or None if there is
+    no sidecar or it was written for another version of the text file, i.e.
+    the size or modification time stored in the sidecar differs from stat
+    of the text file. Both have to match exactly, a text file replaced by
+    one with an older modification time (e.g. cp -p or a restored backup)
+    is parsed again.
+    '''
+    try:
+        with np.load(cache_file(filename)) as sidecar:
+            if (int(sidecar['size']) != stat.st_size
+                    or int(sidecar['mtime_ns']) != stat.st_mtime_ns):
+                return None
+            return sidecar['walls']
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def write_cache(filename, walls, stat):
+    '''
+    Store the validated walls of a maze text file in its sidecar together
+    with the size and modification time of stat, taken before the text file
+    was read. The file is replaced atomically, so parallel loaders never
+    read a partial file, and a directory which is not writable is ignored.
+    '''
+    sidecar = cache_file(filename)
+    tmp_file = '{}.{}.tmp'.format(sidecar, os.getpid())
+    try:
+        with open(tmp_file, 'wb') as f_out:
+            np.savez(f_out, walls=walls, size=np.int64(stat.st_size),
+                     mtime_ns=np.int64(stat.st_mtime_ns))
+        os.replace(tmp_file, sidecar)
+    except OSError:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
+
 class Maze(object):
-    def __init__(self, filename):
+    def __init__(self, filename, cache=None):
         '''
         Maze objects have two main attributes:
         - dim: mazes should be square, with sides of even length. (integer)
@@ -12,48 +216,54 @@ class Maze(object):
             array)
 
         The initialization function also performs some consistency checks for
-        wall positioning.
+        wall positioning. With cache set the validated walls are stored in a
+        .npz sidecar next to the text file, which is loaded instead of
+        parsing and validating the text file again as long as the size and
+        modification time of the text file are unchanged. By default (cache None) the sidecar is only used for
+        text files of at least cache_min_bytes, smaller ones are parsed
+        faster.
         '''
-        with open(filename, 'r') as f_in:
-
-            # First line should be an integer with the maze dimensions
-            self.dim = int(f_in.readline())
-
-            # Subsequent lines describe the permissability of walls
-            walls = []
-            for line in f_in:
-                walls.append(list(map(int,line.split(','))))
-            self.walls = np.array(walls)
-
-        # Perform validation on maze
-        # Maze dimensions
-        if self.dim % 2:
-            raise Exception('Maze dimensions must be even in length!')
-        if self.walls.shape != (self.dim, self.dim):
-            raise Exception('Maze shape does not match dimension attribute!')
+        walls = None
+        if cache is not False:
+            # stat before reading, so a sidecar never matches a newer file
+            stat = os.stat(filename)
+            if cache is None:
+                cache = stat.st_size >= cache_min_bytes
+            if cache:
+                walls = load_cache(filename, stat)
+        if walls is None:
+            dim, walls = read_maze(filename)
+            # Perform validation on maze
+            validate(dim, walls)
+            if cache:
+                write_cache(filename, walls, stat)
 
-        # Wall permeability
-        wall_errors = []
-        # vertical walls
-        for x in range(self.dim-1):
-            for y in range(self.dim):
-                if (self.walls[x,y] & 2 != 0) != (self.walls[x+1,y] & 8 != 0):
-                    wall_errors.append([(x,y), 'v'])
-        # horizontal walls
-        for y in range(self.dim-1):
-            for x in range(self.dim):
-                if (self.walls[x,y] & 1 != 0) != (self.walls[x,y+1] & 4 != 0):
-                    wall_errors.append([(x,y), 'h'])
-
-        if wall_errors:
-            for cell, wall_type in wall_errors:
-                if wall_type == 'v':
-                    cell2 = (cell[0]+1, cell[1])
-                    print('Inconsistent vertical wall betweeen {} and {}'.format(cell, cell2))
-                else:
-                    cell2 = (cell[0], cell[1]+1)
-                    print ('Inconsistent horizontal wall betweeen {} and {}'.format(cell, cell2))
-            raise Exception('Consistency errors found in wall specifications!')
+        self.setup(walls)
+
+    @classmethod
+    def from_walls(cls, walls):
+        '''
+        Returns a Maze of an array of walls, e.g. of a generated maze, after
+        performing the consistency checks.
+        '''
+        walls = np.asarray(walls)
+        validate(walls.shape[0], walls)
+        maze = cls.__new__(cls)
+        maze.setup(walls)
+        return maze
+
+    def setup(self, walls):
+        '''
+        Set the walls and build the tables of a validated maze.
+        '''
+        self.dim = walls.shape[0]
+        self.walls = walls
+
+        # number of open cells to the nearest wall for each cell and direction
+        self.runs = open_runs(self.walls)
+        # sensor readings and travelled cells per cell, heading and movement
+        self.sensors = sensor_table(self.runs)
+        self.moves = move_table(self.runs)
 
 
     def is_permissible(self, cell, direction):
@@ -63,11 +273,9 @@ class Maze(object):
         input as single letter 'u', 'r', 'd', 'l', or complete words 'up', 
         'right', 'down', 'left'.
         """
-        dir_int = {'u': 1, 'r': 2, 'd': 4, 'l': 8,
-                   'up': 1, 'right': 2, 'down': 4, 'left': 8}
         try:
             return (self.walls[tuple(cell)] & dir_int[direction] != 0)
-        except:
+        except KeyError:
             print ('Invalid direction provided!')
 
 
@@ -78,17 +286,4 @@ class Maze(object):
         may be input as a single letter 'u', 'r', 'd', 'l', or complete words
         'up', 'right', 'down', 'left'.
         """
-        dir_move = {'u': [0, 1], 'r': [1, 0], 'd': [0, -1], 'l': [-1, 0],
-                    'up': [0, 1], 'right': [1, 0], 'down': [0, -1], 'left': [-1, 0]}
-
-        sensing = True
-        distance = 0
-        curr_cell = list(cell) # make copy to preserve original
-        while sensing:
-            if self.is_permissible(curr_cell, direction):
-                distance += 1
-                curr_cell[0] += dir_move[direction][0]
-                curr_cell[1] += dir_move[direction][1]
-            else:
-                sensing = False
-        return distance
\ No newline at end of file
+        return int(self.runs[dir_index[direction]][tuple(cell)])
@@ -1,15 +1,28 @@
+import sys
 import turtle
+import tkinter
 import itertools
+import time
+import multiprocessing
+from queue import Empty, Full
+from maze import Maze, wall_segments
+from trajectory import TraceFile
 
 class MazeAnimation():
     '''
     This class will plot graph and summary for robot's movement animation.
     '''
     
-    def __init__(self, maze, start,heading, sq_size):
+    def __init__(self, maze, start,heading, sq_size, batch=False, frame_skip=1,
+                 fps=None, final_only=False):
         '''
         Object Intantiation requires Maze information, robot start position plus
         heading as well the size of node to be displayed on the screen. 
+        With batch set the screen is not updated after each turtle command
+        but once per frame: after every frame_skip moves or, if fps is
+        given, at most fps times per second. With final_only set run1 is
+        not animated and only its final path and visits are drawn once run2
+        starts or the animation is flushed.
         '''
         
         # translate robot heading to turtle heading
@@ -75,60 +88,99 @@ class MazeAnimation():
         # to record timesteps for run2
         self.timestep = 0
 
+        # frame control of batch mode and pending run1 moves of final_only
+        self.batch = batch or final_only
+        self.frame_skip = max(1, frame_skip)
+        self.fps = fps
+        self.final_only = final_only
+        self.moves = 0
+        # no screen updates while seeking a replay
+        self.seeking = False
+        self.last_frame = time.perf_counter()
+        self.run1_path = []
+        self.run1_visits = {}
+        if self.batch:
+            self.window.tracer(0)
+
+    def frame(self):
+        '''
+        Count a move and update the screen if a frame is due in batch mode.
+        '''
+        if not self.batch or self.seeking:
+            return
+        self.moves += 1
+        if self.fps:
+            now = time.perf_counter()
+            if now - self.last_frame < 1 / self.fps:
+                return
+            self.last_frame = now
+        elif self.moves % self.frame_skip:
+            return
+        self.window.update()
+
+    def flush(self):
+        '''
+        Draw pending run1 moves and update the screen in batch mode.
+        '''
+        if self.run1_path:
+            self.draw_run1()
+        if self.batch:
+            self.window.update()
+            self.last_frame = time.perf_counter()
+
+    def draw_run1(self):
+        '''
+        Draw the path of run1 and the final number of visits of each node
+        stored in final_only mode.
+        '''
+        self.wally.color(self.run1_color)
+        self.wally.pensize(1)
+        self.wally.pendown()
+        for heading, move_to in self.run1_path:
+            self.wally.setheading(self.turtle_move[heading])
+            self.wally.goto(self.origin + self.sq_size/2 + self.sq_size * move_to[0], self.origin + self.sq_size/2 + self.sq_size * move_to[1])
+        for node, freq in self.run1_visits.items():
+            self.plot_visits(node, freq)
+        self.run1_path = []
+        self.run1_visits = {}
+
     def showmaze(self, heuristic = None):
         '''
         Plot walls, x/y axis, start and goal marker on the screen.
         Heuristic value plotting is optional.
         '''
-        # iterate through squares one by one to decide where to draw walls
-        for x in range(self.maze.dim):
-            for y in range(self.maze.dim):
-                # Plot heuristic value
-                if heuristic is not None:
+        # Plot heuristic value
+        if heuristic is not None:
+            self.wally.color('blue')
+            for x in range(self.maze.dim):
+                for y in range(self.maze.dim):
                     h_value = heuristic[x][y]
-                    self.wally.color('blue')
                     self.wally.penup()
                     self.wally.goto(self.origin + self.sq_size/2 + self.sq_size * x, self.origin + self.sq_size/2 + self.sq_size * y)
                     self.wally.down()
                     self.wally.write(h_value,font=('Arial', 20), align='left')
                     self.wally.penup()
-                    self.wally.color('black')
-                if not self.maze.is_permissible([x,y], 'up'):
-                    self.wally.goto(self.origin + self.sq_size * x, self.origin + self.sq_size * (y+1))
-                    self.wally.setheading(0)
-                    self.wally.pendown()
-                    self.wally.forward(self.sq_size)
-                    self.wally.penup()
-                if not self.maze.is_permissible([x,y], 'right'):
-                    self.wally.goto(self.origin + self.sq_size * (x+1), self.origin + self.sq_size * y)
-                    self.wally.setheading(90)
-                    self.wally.pendown()
-                    self.wally.forward(self.sq_size)
-                    self.wally.penup()
-                # onself.ly check bottom wall if on lowest row
-                if y == 0 and not self.maze.is_permissible([x,y], 'down'):
-                    self.wally.goto(self.origin + self.sq_size * x, self.origin)
-                    self.wally.setheading(0)
-                    self.wally.pendown()
-                    self.wally.forward(self.sq_size)
-                    self.wally.penup()
-                    # plot x-horizontal coordinate
-                    self.wally.goto(self.origin + self.sq_size * x +self.sq_size / 3, self.origin - 40)
-                    self.wally.down()
-                    self.wally.write(x,font=('Arial', 20), align='left')
-                    self.wally.penup()
-                # only check left wall if on leftmost column
-                if x == 0 and not self.maze.is_permissible([x,y], 'left'):
-                    self.wally.goto(self.origin, self.origin + self.sq_size * y)
-                    self.wally.setheading(90)
-                    self.wally.pendown()
-                    self.wally.forward(self.sq_size)
-                    self.wally.penup()
-                    # plot y-vertical coordinate
-                    self.wally.goto(self.origin-40, self.origin + self.sq_size * y + self.sq_size / 3 )
-                    self.wally.down()
-                    self.wally.write(y,font=('Arial', 20), align='left')
-                    self.wally.penup()
+            self.wally.color('black')
+
+        # draw the walls merged into straight runs, one line per run
+        self.wally.penup()
+        for x0, y0, x1, y1 in wall_segments(self.maze.walls).tolist():
+            self.wally.goto(self.origin + self.sq_size * x0, self.origin + self.sq_size * y0)
+            self.wally.pendown()
+            self.wally.goto(self.origin + self.sq_size * x1, self.origin + self.sq_size * y1)
+            self.wally.penup()
+
+        # plot x-horizontal and y-vertical coordinates along the bottom and
+        # left border
+        for i in range(self.maze.dim):
+            self.wally.goto(self.origin + self.sq_size * i +self.sq_size / 3, self.origin - 40)
+            self.wally.down()
+            self.wally.write(i,font=('Arial', 20), align='left')
+            self.wally.penup()
+            self.wally.goto(self.origin-40, self.origin + self.sq_size * i + self.sq_size / 3 )
+            self.wally.down()
+            self.wally.write(i,font=('Arial', 20), align='left')
+            self.wally.penup()
 
         # mark the start
         self.wally.color('black', 'blue')
@@ -162,6 +214,9 @@ class MazeAnimation():
         self.finisher.setpos(self.origin + self.start[0] * self.sq_size + self.sq_size/2 + 4, self.origin + self.start[1] * self.sq_size + self.sq_size/2)
         self.finisher.setheading(self.turtle_move[self.heading])
 
+        # maze is shown in a single frame
+        self.flush()
+
         return 
         
         
@@ -173,6 +228,14 @@ class MazeAnimation():
         
         self.heading = heading
 
+        # keep run1 moves until run2 or flush in final_only mode
+        if run == 0 and self.final_only:
+            self.run1_path.append((heading, list(move_to)))
+            self.run1_visits[tuple(move_to)] = freq
+            return
+        if self.run1_path:
+            self.flush()
+
         # plot for each run
         if run == 0:
             self.wally.color(self.run1_color)
@@ -184,13 +247,7 @@ class MazeAnimation():
             self.wally.goto(pos_in_screen)
             
             # goto slightly center of each node and plot number of visits
-            self.writer.goto(self.origin + move_to[0]*self.sq_size + self.sq_size/4, self.origin + move_to[1]*self.sq_size + self.sq_size/8)
-            self.writer.color(self.run1_color,'white')
-            self.writer.begin_fill()
-            self.writer.circle(self.text_circle)
-            self.writer.end_fill()
-            self.writer.write(freq,font=self.run1_font, align='left')
-            self.writer.penup()
+            self.plot_visits(move_to, freq)
 
         else:
 
@@ -210,13 +267,29 @@ class MazeAnimation():
             self.writer.write(self.timestep,font=self.run2_font, align='left')
             self.writer.penup()
 
+        self.frame()
+
         return
 
+    def plot_visits(self, node, freq):
+        '''
+        Plot the number of robot visits slightly off the center of a node.
+        '''
+        self.writer.goto(self.origin + node[0]*self.sq_size + self.sq_size/4, self.origin + node[1]*self.sq_size + self.sq_size/8)
+        self.writer.color(self.run1_color,'white')
+        self.writer.begin_fill()
+        self.writer.circle(self.text_circle)
+        self.writer.end_fill()
+        self.writer.write(freq,font=self.run1_font, align='left')
+        self.writer.penup()
+
 
     def plot_summary (self, summary_text):
         '''
         Plot given summary text file on top of maze walls.
         '''
+        if self.run1_path:
+            self.draw_run1()
         self.writer.color(self.summary_color)
 
         # plot maze file
@@ -250,5 +323,215 @@ class MazeAnimation():
         self.writer.down()
         self.writer.write("score: "+ str(summary_text["score"]),font=self.summary_font, align='left')
         self.writer.penup()
+
+        self.flush()
         
         return
+
+    def postscript(self, filename):
+        '''
+        Store the drawing as postscript file.
+        '''
+        self.flush()
+        self.window.getcanvas().postscript(file=filename)
+
+    def clear(self):
+        '''
+        Erase the drawing before the next animation.
+        '''
+        self.window.clear()
+        self.window.reset()
+
+    def exitonclick(self):
+        '''
+        Keep the window open until it is clicked.
+        '''
+        self.flush()
+        self.window.exitonclick()
+
+
+def animation_worker(commands, idle=0.05):
+    '''
+    Main loop of the animation process. Each command is (name, args):
+    ('start', (walls, start, heading, sq_size, kwargs)) draws a new maze,
+    ('close', (wait,)) ends the process, optionally after the window is
+    clicked, and all other names are methods of MazeAnimation called with
+    args. The screen is updated whenever no command arrived for idle
+    seconds, without drawing pending moves.
+    '''
+    mazeanim = None
+    try:
+        while True:
+            try:
+                name, args = commands.get(timeout=idle)
+            except Empty:
+                # only refresh the screen, pending run1 moves of final_only
+                # are drawn by run2, plot_summary or an explicit flush
+                if mazeanim is not None:
+                    mazeanim.window.update()
+                continue
+            if name == 'start':
+                walls, start, heading, sq_size, kwargs = args
+                mazeanim = MazeAnimation(Maze.from_walls(walls), start, heading, sq_size, **kwargs)
+                mazeanim.showmaze()
+            elif name == 'close':
+                if args[0] and mazeanim is not None:
+                    mazeanim.exitonclick()
+                break
+            elif mazeanim is not None:
+                getattr(mazeanim, name)(*args)
+    except (turtle.Terminator, tkinter.TclError):
+        # window closed by the user
+        pass
+
+
+class AnimationProcess(object):
+    '''
+    Runs MazeAnimation in its own process fed by a bounded queue of at most
+    queue_size commands, so the simulation is not slowed down by drawing.
+    It has the drawing methods of MazeAnimation, a new maze is drawn by
+    start instead of creating a new animation. With policy 'block' the
+    caller waits while the queue is full, with policy 'drop' moves are
+    dropped instead and counted in dropped. If pace is given the caller is
+    held to at most pace moves per second. Commands are ignored once the
+    window was closed.
+    '''
+
+    def __init__(self, queue_size=1000, policy='block', pace=None):
+        if policy not in ('block', 'drop'):
+            raise ValueError("Unknown policy {}, use block or drop.".format(policy))
+        self.policy = policy
+        self.pace = pace
+        self.dropped = 0
+        self.moves = 0
+        self.started = time.perf_counter()
+        self.commands = multiprocessing.Queue(queue_size)
+        self.process = multiprocessing.Process(target=animation_worker, args=(self.commands,), daemon=True)
+        self.process.start()
+
+    def send(self, name, *args, drop=False):
+        '''
+        Queue a command for the animation process, see animation_worker.
+        With drop set the command is dropped if the queue is full.
+        '''
+        while self.process.is_alive():
+            try:
+                if drop:
+                    self.commands.put_nowait((name, args))
+                else:
+                    self.commands.put((name, args), timeout=0.1)
+                return True
+            except Full:
+                if drop:
+                    self.dropped += 1
+                    return False
+        return False
+
+    def start(self, maze, start, heading, sq_size, **kwargs):
+        '''
+        Draw a new maze, kwargs are passed to MazeAnimation.
+        '''
+        self.moves = 0
+        self.started = time.perf_counter()
+        self.send('start', maze.walls, start, heading, sq_size, kwargs)
+
+    def plot_move(self, heading, move_to, run, freq):
+        self.send('plot_move', heading, list(move_to), run, freq, drop=self.policy == 'drop')
+        # wait for the time of the move at the given pace
+        self.moves += 1
+        if self.pace:
+            delay = self.started + self.moves / self.pace - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+    def plot_summary(self, summary_text):
+        self.send('plot_summary', summary_text)
+
+    def flush(self):
+        self.send('flush')
+
+    def postscript(self, filename):
+        self.send('postscript', filename)
+
+    def clear(self):
+        self.send('clear')
+
+    def close(self, wait=False):
+        '''
+        Draw all queued commands and end the animation process, with wait
+        set after the window was clicked.
+        '''
+        self.send('close', wait)
+        self.process.join()
+
+    def exitonclick(self):
+        self.close(wait=True)
+
+
+# heading names of the heading indices of a trace
+trace_headings = ['up', 'right', 'down', 'left']
+
+
+def replay(trial, maze, sq_size=50, start_step=0, speed=None, frame_skip=1):
+    '''
+    Replay a trial recorded by the simulator, see TraceFile.trial. The moves
+    before start_step are drawn in a single frame, the remaining moves are
+    played at speed moves per second or as fast as possible if speed is
+    None. Returns the MazeAnimation.
+    '''
+    mazeanim = MazeAnimation(maze, [0, 0], "up", sq_size, batch=True, frame_skip=frame_skip)
+    mazeanim.showmaze()
+
+    # number of visits per node like the table of the simulator, the start
+    # is set to a single visit when a run starts
+    visits = {(0, 0): 1}
+    run = 0
+    mazeanim.seeking = start_step > 0
+    start = time.perf_counter()
+    for step in range(len(trial['x'])):
+        if step == start_step and step > 0:
+            mazeanim.seeking = False
+            mazeanim.flush()
+            start = time.perf_counter()
+        if trial['run'][step] != run:
+            run = int(trial['run'][step])
+            visits[(0, 0)] = 1
+        node = (int(trial['x'][step]), int(trial['y'][step]))
+        visits[node] = visits.get(node, 0) + 1
+        mazeanim.plot_move(trace_headings[trial['heading'][step]], list(node), run, visits[node])
+        # wait for the time of the move at the given speed
+        if speed and step >= start_step:
+            delay = start + (step - start_step + 1) / speed - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+    mazeanim.seeking = False
+
+    mazeanim.plot_summary({"maze": trial['maze'] or '', "alg": trial['alg'] or '',
+                           "run1": trial['run1'], "run2": trial['run2'],
+                           "coverage": trial['coverage'], "score": trial['score']})
+    return mazeanim
+
+
+if __name__ == '__main__':
+    '''
+    This script replays a trial of a trace file recorded by alg_tester.py:
+    python mazeanim.py trace_file index start_step speed
+    e.g. python mazeanim.py traces.npz 3 100 20
+    Without index the trials of the file are listed. start_step and speed in
+    moves per second are optional, by default the trial is played from the
+    start as fast as possible.
+    '''
+
+    traces = TraceFile(sys.argv[1])
+    if len(sys.argv) < 3:
+        for i in range(len(traces)):
+            trial = traces.trial(i)
+            print(i, trial['maze'], trial['alg'], trial['attempt'], trial['seed'],
+                  trial['run1'], trial['run2'], trial['score'], trial['coverage'])
+        sys.exit()
+
+    trial = traces.trial(int(sys.argv[2]))
+    start_step = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+    speed = float(sys.argv[4]) if len(sys.argv) > 4 else None
+    mazeanim = replay(trial, Maze(trial['maze']), start_step=start_step, speed=speed)
+    mazeanim.window.exitonclick()
@@ -0,0 +1,160 @@
+import os
+import sys
+import numpy as np
+from maze import Maze
+
+# center goal layouts: None for a plain maze, 'open' for the four goal
+# nodes joined to a room and 'room' for a walled room with a single entrance
+layouts = [None, 'open', 'room']
+# sides the entrance of a walled goal room can be on
+entrances = ['right', 'up', 'down']
+
+
+def generate_walls(dim, n=1, seed=None, loop_density=0., layout='room'):
+    '''
+    Returns an array of shape (n, dim, dim) of walls of n mazes in the
+    format of Maze.walls. Mazes are generated by a column wise sidewinder
+    run on all mazes at once: the nodes of each column are joined upwards
+    with probability one half and each run of joined nodes opens the right
+    wall of one random node, the last column is a single run. This makes a
+    perfect maze in which all nodes are reachable, then loop_density of the
+    remaining inner walls are removed at random. The start node only opens
+    upwards. Mazes are reproducible from the seed.
+    '''
+
+    if dim % 2 or dim < 4:
+        raise Exception('Maze dimensions must be even in length!')
+    if layout not in layouts:
+        raise Exception('Unknown center goal layout {}!'.format(layout))
+    if layout == 'room' and dim < 6:
+        raise Exception('Maze dimensions must be at least 6 for a goal room!')
+
+    rng = np.random.default_rng(seed)
+    c = dim // 2
+
+    # join node (x, y) with (x, y+1), the last column is a single run
+    up = rng.random((n, dim, dim - 1)) < 0.5
+    up[:, dim - 1, :] = True
+    # random key of each node, the node with the highest key of a run opens
+    # its right wall. Nodes with key -1 are never selected.
+    key = rng.random((n, dim, dim))
+
+    # start node is joined upwards and does not open its right wall
+    up[:, 0, 0] = True
+    key[:, 0, 0] = -1
+
+    if layout == 'room':
+        # goal nodes form a run in each of the two center columns, the run
+        # of the left column opens into the right column
+        up[:, c - 1:c + 1, c - 1] = True
+        up[:, c - 1, c - 2] = False
+        up[:, c - 1, c] = False
+        # the column left of the room never opens into it, its run along the
+        # room is extended by the node below so there is always a choice
+        up[:, c - 2, c - 2:c] = True
+        key[:, c - 2, c - 1:c + 1] = -1
+        # the run of the right goal column is closed and opens to the right
+        # or is joined with the node above or below it, which is then the
+        # only entrance of the room
+        entrance = rng.integers(len(entrances), size=n)
+        up[:, c, c - 2] = entrance == entrances.index('down')
+        up[:, c, c] = entrance == entrances.index('up')
+        side = entrance != entrances.index('right')
+        key[side, c, c - 1:c + 1] = -1
+
+    # runs are numbered over all columns of all mazes at once. The highest key
+    # of each run is found with reduceat at the first node of each run.
+    start = np.ones((n, dim, dim), dtype=bool)
+    start[:, :, 1:] = ~up
+    run_first = np.flatnonzero(start)
+    run_id = np.cumsum(start.ravel()) - 1
+    run_max = np.maximum.reduceat(key.ravel(), run_first)
+    east = (key.ravel() == run_max[run_id]).reshape(n, dim, dim)
+    east[:, dim - 1, :] = False
+
+    # inner walls which must not be removed as loops: the right wall of the
+    # start node and the walls around a goal room
+    keep_east = np.zeros((n, dim - 1, dim), dtype=bool)
+    keep_up = np.zeros((n, dim, dim - 1), dtype=bool)
+    keep_east[:, 0, 0] = True
+    if layout == 'room':
+        keep_east[:, c - 2, c - 1:c + 1] = True
+        keep_east[:, c, c - 1:c + 1] = True
+        keep_up[:, c - 1:c + 1, c - 2] = True
+        keep_up[:, c - 1:c + 1, c] = True
+    if loop_density > 0:
+        up |= ~keep_up & (rng.random(up.shape) < loop_density)
+        east[:, :-1, :] |= ~keep_east & (rng.random(keep_east.shape) < loop_density)
+    if layout in ('open', 'room'):
+        # all walls between the goal nodes are open
+        up[:, c - 1:c + 1, c - 1] = True
+        east[:, c - 1, c - 1:c + 1] = True
+
+    # set the wall bits on both sides of each open wall
+    walls = np.zeros((n, dim, dim), dtype=np.uint8)
+    walls[:, :, :-1] |= (up * 1).astype(np.uint8)
+    walls[:, :, 1:] |= (up * 4).astype(np.uint8)
+    walls[:, :-1, :] |= (east[:, :-1, :] * 2).astype(np.uint8)
+    walls[:, 1:, :] |= (east[:, :-1, :] * 8).astype(np.uint8)
+
+    return walls
+
+
+def generate(dim, seed=None, loop_density=0., layout='room'):
+    '''
+    Returns a generated Maze, see generate_walls.
+    '''
+    return Maze.from_walls(generate_walls(dim, 1, seed, loop_density, layout)[0])
+
+
+def generate_batch(dim, n, seed=None, loop_density=0., layout='room'):
+    '''
+    Returns a list of n generated Mazes, see generate_walls.
+    '''
+    return [Maze.from_walls(walls)
+            for walls in generate_walls(dim, n, seed, loop_density, layout)]
+
+
+def write_maze(filename, walls):
+    '''
+    Write walls to a maze text file: the dimension in the first line
+    followed by one line of comma separated wall values per column.
+    '''
+    with open(filename, 'w') as f_out:
+        f_out.write('{}\n'.format(walls.shape[0]))
+        np.savetxt(f_out, walls, fmt='%d', delimiter=',')
+
+
+def write_corpus(directory, dim, n, seed=None, loop_density=0., layout='room'):
+    '''
+    Generate n mazes and write them as maze_<dim>_<index>.txt to directory.
+    Returns the list of file names.
+    '''
+    os.makedirs(directory, exist_ok=True)
+    filenames = []
+    for idx, walls in enumerate(generate_walls(dim, n, seed, loop_density, layout)):
+        filename = os.path.join(directory, 'maze_{}_{:05d}.txt'.format(dim, idx))
+        write_maze(filename, walls)
+        filenames.append(filename)
+    return filenames
+
+
+if __name__ == '__main__':
+    '''
+    This script writes generated mazes to a directory, all arguments are
+    optional:
+    python mazegen.py dim count seed loop_density layout directory
+    e.g. python mazegen.py 64 1000 0 0.1 room mazes
+    '''
+
+    dim = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    seed = int(sys.argv[3]) if len(sys.argv) > 3 else None
+    loop_density = float(sys.argv[4]) if len(sys.argv) > 4 else 0.
+    layout = sys.argv[5] if len(sys.argv) > 5 else 'room'
+    if layout == 'none':
+        layout = None
+    directory = sys.argv[6] if len(sys.argv) > 6 else 'mazes'
+
+    filenames = write_corpus(directory, dim, count, seed, loop_density, layout)
+    print("Mazes written:", len(filenames), " to:", directory)
@@ -0,0 +1,195 @@
+import heapq
+import random
+
+
+class IncrementalPlanner(object):
+    '''
+    Lifelong Planning A* (LPA*) over the robot's known maze which keeps its
+    search state across exploration steps. The search is rooted at the open
+    nodes (sources), so g of any node is the lowest number of timesteps to
+    reach one of the open nodes plus the cost of that node. The robot only
+    queries its own position, therefore the robot moving around does not
+    invalidate anything and only newly opened walls or changes of the open
+    nodes need to be repaired.
+    '''
+
+    def __init__(self, maze_dim, max_move=3, rng=None):
+        '''
+        Object instantiation requires the maze dimension and the maximum
+        number of nodes the robot can move in one timestep. Nodes are
+        addressed by their flat index x * maze_dim + y. Ties are chosen
+        with rng, e.g. the random.Random of the robot, or a generator of
+        its own.
+        '''
+
+        self.maze_dim = maze_dim
+        self.max_move = max_move
+        self.rng = random.Random() if rng is None else rng
+        self.inf = float("inf")
+
+        # known walls of the maze, g and rhs value of each node
+        self.walls = [0] * (maze_dim * maze_dim)
+        self.g = [self.inf] * (maze_dim * maze_dim)
+        self.rhs = [self.inf] * (maze_dim * maze_dim)
+        # cost of each source, i.e. open node, the planner is rooted at
+        self.sources = {}
+        # heap of inconsistent nodes, entries are (key, node). Entries whose
+        # key is outdated are skipped when popped.
+        self.queue = []
+
+        # wall bit, reverse wall bit and moving vector per direction
+        self.dir_step = {
+            "u": (1, 4, (0, 1)),
+            "r": (2, 8, (1, 0)),
+            "d": (4, 1, (0, -1)),
+            "l": (8, 2, (-1, 0)),
+        }
+        self.steps = [(1, 1), (2, maze_dim), (4, -1), (8, -maze_dim)]
+
+        # counters of updated and expanded nodes
+        self.updated = 0
+        self.expanded = 0
+
+    def neighbours(self, node):
+        '''
+        Returns the nodes reachable from the given node with a single straight
+        move of up to max_move nodes. As walls are symmetric these are also
+        the nodes the given node can be reached from.
+        '''
+
+        walls = self.walls
+        neighbours = []
+        for wall_bit, step in self.steps:
+            next_node = node
+            for i in range(self.max_move):
+                if walls[next_node] & wall_bit == 0:
+                    break
+                next_node += step
+                neighbours.append(next_node)
+
+        return neighbours
+
+    def update_node(self, node):
+        '''
+        Recalculate rhs of the node and queue it if it became inconsistent.
+        '''
+
+        self.updated += 1
+        rhs = self.sources.get(node, self.inf)
+        for next_node in self.neighbours(node):
+            if self.g[next_node] + 1 < rhs:
+                rhs = self.g[next_node] + 1
+        self.rhs[node] = rhs
+        if self.g[node] != rhs:
+            heapq.heappush(self.queue, (min(self.g[node], rhs), node))
+
+        return
+
+    def add_source(self, node, cost=0):
+        '''
+        Add an open node given as [x, y] with the cost to be added to the
+        timesteps of reaching it.
+        '''
+
+        flat_node = int(node[0]) * self.maze_dim + int(node[1])
+        self.sources[flat_node] = cost
+        self.update_node(flat_node)
+
+        return
+
+    def remove_source(self, node):
+        '''
+        Remove an open node given as [x, y], e.g. once it is visited.
+        '''
+
+        flat_node = int(node[0]) * self.maze_dim + int(node[1])
+        if self.sources.pop(flat_node, None) is not None:
+            self.update_node(flat_node)
+
+        return
+
+    def open_wall(self, node, direction):
+        '''
+        Mark the wall of a node given as [x, y] in the given direction as
+        passable. Only nodes which can move across this wall with a single
+        straight move are updated.
+        '''
+
+        wall_bit, reverse_bit, move = self.dir_step[direction]
+        x, y = int(node[0]), int(node[1])
+        flat_node = x * self.maze_dim + y
+        next_node = flat_node + move[0] * self.maze_dim + move[1]
+        if self.walls[flat_node] & wall_bit:
+            return
+        self.walls[flat_node] |= wall_bit
+        self.walls[next_node] |= reverse_bit
+
+        # straight moves across the wall start at most max_move - 1 nodes
+        # before the node and end at most max_move - 1 nodes after the
+        # adjacent node
+        for i in range(1 - self.max_move, self.max_move + 1):
+            nx = x + i * move[0]
+            ny = y + i * move[1]
+            if 0 <= nx < self.maze_dim and 0 <= ny < self.maze_dim:
+                self.update_node(nx * self.maze_dim + ny)
+
+        return
+
+    def compute(self, start):
+        '''
+        Expand inconsistent nodes until g of the start node is consistent and
+        no queued node can lower it any more.
+        '''
+
+        g = self.g
+        rhs = self.rhs
+        queue = self.queue
+        while queue:
+            key, node = queue[0]
+            # skip entries of nodes which became consistent or were requeued
+            if g[node] == rhs[node] or key != min(g[node], rhs[node]):
+                heapq.heappop(queue)
+                continue
+            if key >= min(g[start], rhs[start]) and g[start] == rhs[start]:
+                break
+            heapq.heappop(queue)
+            self.expanded += 1
+            if g[node] > rhs[node]:
+                g[node] = rhs[node]
+            else:
+                g[node] = self.inf
+                self.update_node(node)
+            for next_node in self.neighbours(node):
+                self.update_node(next_node)
+
+        return
+
+    def find_path(self, start):
+        '''
+        Returns the path of nodes from a start given as [x, y] to the open
+        node with the lowest timesteps plus cost or None if no open node can
+        be reached. Ties are chosen randomly.
+        '''
+
+        flat_start = int(start[0]) * self.maze_dim + int(start[1])
+        self.compute(flat_start)
+        if self.g[flat_start] == self.inf:
+            return None
+
+        # follow decreasing g values until the chosen open node is reached.
+        # These nodes have a lower key than the start and are consistent.
+        path = [flat_start]
+        node = flat_start
+        while True:
+            selection = []
+            if self.sources.get(node) == self.g[node]:
+                selection.append(None)
+            for next_node in self.neighbours(node):
+                if self.g[next_node] + 1 == self.g[node]:
+                    selection.append(next_node)
+            node = self.rng.choice(selection)
+            if node is None:
+                break
+            path.append(node)
+
+        return [list(divmod(node, self.maze_dim)) for node in path]
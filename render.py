@@ -0,0 +1,297 @@
+import os
+import sys
+import zlib
+import struct
+import numpy as np
+from maze import Maze, wall_lines, wall_segments
+from trajectory import TraceFile
+
+# colors of the background, walls, goal markers, the most visited node and
+# the paths of run1 and run2 like in mazeanim.py
+colors = {
+    'background': (255, 255, 255),
+    'wall': (0, 0, 0),
+    'goal': (255, 0, 0),
+    'visits': (255, 140, 0),
+    'run1': (0, 0, 255),
+    'run2': (0, 128, 0),
+}
+
+# image formats written by Renderer.save
+formats = ['png', 'ppm', 'svg']
+
+
+def trace_visits(trial, dim):
+    '''
+    Returns the table of visits of a recorded trial, see TraceFile.trial,
+    like the table of the simulator.
+    '''
+    visits = np.zeros((dim, dim), dtype=int)
+    for run in range(2):
+        moves = trial['run'] == run
+        if run == 0 or trial['run1'] is not None:
+            # the start is set to a single visit when a run starts
+            visits[0, 0] = 1
+        np.add.at(visits, (trial['x'][moves], trial['y'][moves]), 1)
+    return visits
+
+
+def trace_paths(trial):
+    '''
+    Returns the paths of run1 and run2 of a recorded trial as (points, color)
+    where points are the nodes of the run starting in the start node.
+    '''
+    paths = []
+    for run, color in enumerate(['run1', 'run2']):
+        moves = trial['run'] == run
+        if moves.any():
+            points = np.column_stack((trial['x'][moves], trial['y'][moves]))
+            paths.append((np.vstack(([0, 0], points)), color))
+    return paths
+
+
+def write_png(filename, image, level=6):
+    '''
+    Write an RGB image of shape (height, width, 3) as PNG.
+    '''
+    height, width = image.shape[:2]
+    # every row starts with filter type 0
+    raw = np.zeros((height, width * 3 + 1), dtype=np.uint8)
+    raw[:, 1:] = image.reshape(height, -1)
+
+    def chunk(tag, data):
+        return (struct.pack('>I', len(data)) + tag + data
+                + struct.pack('>I', zlib.crc32(tag + data) & 0xffffffff))
+
+    with open(filename, 'wb') as f_out:
+        f_out.write(b'\x89PNG\r\n\x1a\n')
+        f_out.write(chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)))
+        f_out.write(chunk(b'IDAT', zlib.compress(raw.tobytes(), level)))
+        f_out.write(chunk(b'IEND', b''))
+
+
+def write_ppm(filename, image):
+    '''
+    Write an RGB image of shape (height, width, 3) as binary PPM.
+    '''
+    height, width = image.shape[:2]
+    with open(filename, 'wb') as f_out:
+        f_out.write('P6 {} {} 255\n'.format(width, height).encode())
+        f_out.write(np.ascontiguousarray(image, dtype=np.uint8).tobytes())
+
+
+class Renderer(object):
+    '''
+    Draws a maze with an optional heatmap of visits and robot paths without
+    a display, as RGB image array or SVG text. Nodes are cell pixels wide,
+    the walls of the maze are computed once and reused for every image.
+    '''
+
+    def __init__(self, maze, cell=8, margin=None):
+        self.maze = maze
+        self.dim = maze.dim
+        self.cell = cell
+        self.margin = cell // 2 if margin is None else margin
+        self.size = self.dim * cell + 2 * self.margin + 1
+        self.horizontal, self.vertical = wall_lines(maze.walls)
+        self.segments = wall_segments(maze.walls)
+        self.wall_width = max(1, cell // 8)
+        self.path_width = max(1, cell // 8)
+        self.goals = [self.dim // 2 - 1, self.dim // 2]
+        self.mask = self.wall_mask()
+
+    def wall_mask(self):
+        '''
+        Returns the pixels of the walls as boolean array [row, column] with
+        row 0 at the bottom of the maze.
+        '''
+        cell, margin, dim = self.cell, self.margin, self.dim
+        mask = np.zeros((self.size, self.size), dtype=bool)
+        lines = margin + np.arange(dim + 1) * cell
+        span = slice(margin, margin + dim * cell + 1)
+        # each unit wall covers the pixels of both of its end points
+        horizontal = np.zeros((dim + 1, dim * cell + 1), dtype=bool)
+        vertical = np.zeros((dim + 1, dim * cell + 1), dtype=bool)
+        horizontal[:, :-1] = np.repeat(self.horizontal, cell, axis=1)
+        horizontal[:, 1:] |= horizontal[:, :-1].copy()
+        vertical[:, :-1] = np.repeat(self.vertical, cell, axis=1)
+        vertical[:, 1:] |= vertical[:, :-1].copy()
+        for offset in range(-(self.wall_width // 2), self.wall_width - self.wall_width // 2):
+            mask[lines + offset, span] |= horizontal
+            mask[span, lines + offset] |= vertical.T
+        return mask
+
+    def heat_colors(self, visits):
+        '''
+        Returns the colors of the nodes as (dim, dim, 3) array, shading from
+        the background for unvisited nodes to the visits color for the most
+        visited node on a logarithmic scale.
+        '''
+        visits = np.asarray(visits)
+        scale = np.log1p(visits) / max(np.log1p(visits.max()), 1e-9)
+        background = np.array(colors['background'], dtype=float)
+        heat = np.array(colors['visits'], dtype=float)
+        return (background + scale[..., None] * (heat - background)).astype(np.uint8)
+
+    def center(self, points, offset=0):
+        '''
+        Returns the pixel coordinates of the centers of the nodes.
+        '''
+        return self.margin + np.asarray(points) * self.cell + self.cell // 2 + offset
+
+    def draw_path(self, image, points, color, offset=0):
+        '''
+        Draw straight lines between consecutive nodes of points, all pixels
+        of all lines are set at once.
+        '''
+        pixels = self.center(points, offset)
+        if len(pixels) < 2:
+            return
+        start, end = pixels[:-1], pixels[1:]
+        delta = end - start
+        steps = np.abs(delta).max(axis=1)
+        counts = steps + 1
+        # position of every pixel within its line
+        line = np.repeat(np.arange(len(steps)), counts)
+        step = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        fraction = step / np.maximum(steps[line], 1)
+        xs = np.rint(start[line, 0] + delta[line, 0] * fraction).astype(int)
+        ys = np.rint(start[line, 1] + delta[line, 1] * fraction).astype(int)
+        for shift in range(self.path_width):
+            image[ys + shift, xs + shift] = colors[color]
+
+    def raster(self, visits=None, paths=()):
+        '''
+        Returns the image as uint8 array of shape (size, size, 3). visits is
+        a (dim, dim) table of visits drawn as heatmap, paths a list of
+        (points, color) where color is a key of colors.
+        '''
+        cell, margin, dim = self.cell, self.margin, self.dim
+        image = np.empty((self.size, self.size, 3), dtype=np.uint8)
+        image[:] = colors['background']
+        if visits is not None:
+            # node colors indexed [y, x] and scaled up to cell pixels
+            heat = self.heat_colors(visits).transpose(1, 0, 2)
+            image[margin:margin + dim * cell, margin:margin + dim * cell] = \
+                np.repeat(np.repeat(heat, cell, axis=0), cell, axis=1)
+        image[self.mask] = colors['wall']
+
+        # goal markers in the center of the goal nodes
+        marker = max(1, cell // 4)
+        for x in self.goals:
+            for y in self.goals:
+                cx, cy = self.center([x, y]) - marker // 2
+                image[cy:cy + marker, cx:cx + marker] = colors['goal']
+
+        # run2 is drawn slightly off the center like in mazeanim.py
+        for points, color in paths:
+            self.draw_path(image, points, color, cell // 6 if color == 'run2' else 0)
+
+        # row 0 is the bottom of the maze
+        return image[::-1]
+
+    def svg(self, visits=None, paths=(), labels=False):
+        '''
+        Returns the image as SVG text, see raster. With labels set the number
+        of visits is written into each visited node.
+        '''
+        cell, margin, size = self.cell, self.margin, self.size
+
+        def point(x, y):
+            # pixel coordinates of a grid point, y axis pointing down
+            return '{} {}'.format(margin + x * cell, size - 1 - margin - y * cell)
+
+        def rgb(color):
+            return 'rgb({},{},{})'.format(*color)
+
+        parts = ['<svg xmlns="http://www.w3.org/2000/svg" width="{0}" height="{0}" viewBox="0 0 {0} {0}">'.format(size),
+                 '<rect width="{0}" height="{0}" fill="{1}"/>'.format(size, rgb(colors['background']))]
+
+        if visits is not None:
+            visits = np.asarray(visits)
+            heat = self.heat_colors(visits)
+            for x, y in np.argwhere(visits > 0):
+                parts.append('<rect x="{}" y="{}" width="{}" height="{}" fill="{}"/>'.format(
+                    margin + x * cell, size - 1 - margin - (y + 1) * cell, cell, cell, rgb(heat[x, y])))
+                if labels:
+                    parts.append('<text x="{}" y="{}" font-size="{}" text-anchor="middle">{}</text>'.format(
+                        margin + x * cell + cell / 2, size - 1 - margin - y * cell - cell / 4, cell / 2, visits[x, y]))
+
+        # one path element of all merged walls
+        segments = ['M{}L{}'.format(point(x0, y0), point(x1, y1))
+                    for x0, y0, x1, y1 in self.segments]
+        parts.append('<path d="{}" stroke="{}" stroke-width="{}" fill="none" stroke-linecap="square"/>'.format(
+            ''.join(segments), rgb(colors['wall']), self.wall_width))
+
+        for x in self.goals:
+            for y in self.goals:
+                parts.append('<circle cx="{}" cy="{}" r="{}" fill="{}"/>'.format(
+                    margin + x * cell + cell / 2, size - 1 - margin - y * cell - cell / 2,
+                    max(1, cell / 8), rgb(colors['goal'])))
+
+        for points, color in paths:
+            offset = cell / 6 if color == 'run2' else 0
+            coords = ' '.join('{},{}'.format(margin + x * cell + cell / 2 + offset,
+                                             size - 1 - margin - y * cell - cell / 2)
+                              for x, y in np.asarray(points))
+            parts.append('<polyline points="{}" stroke="{}" stroke-width="{}" fill="none"/>'.format(
+                coords, rgb(colors[color]), self.path_width))
+
+        parts.append('</svg>')
+        return '\n'.join(parts)
+
+    def save(self, filename, visits=None, paths=(), labels=False):
+        '''
+        Write the image as SVG, PNG or PPM depending on the file extension.
+        '''
+        extension = os.path.splitext(filename)[1].lower().lstrip('.')
+        if extension == 'svg':
+            with open(filename, 'w') as f_out:
+                f_out.write(self.svg(visits, paths, labels))
+        elif extension == 'png':
+            write_png(filename, self.raster(visits, paths))
+        elif extension == 'ppm':
+            write_ppm(filename, self.raster(visits, paths))
+        else:
+            raise ValueError("Unknown image format {}, use one of {}.".format(extension, formats))
+
+
+def export_trials(traces, directory, fmt='png', cell=8, indices=None):
+    '''
+    Write an image of the visits and paths of each trial of a TraceFile, or
+    only of the given indices, to directory as trial_<index>.<fmt>. The
+    renderer of each maze is reused for all of its trials. Returns the list
+    of file names.
+    '''
+    os.makedirs(directory, exist_ok=True)
+    renderers = {}
+    filenames = []
+    for index in (range(len(traces)) if indices is None else indices):
+        trial = traces.trial(index)
+        if trial['maze'] not in renderers:
+            renderers[trial['maze']] = Renderer(Maze(trial['maze']), cell)
+        renderer = renderers[trial['maze']]
+        filename = os.path.join(directory, 'trial_{:05d}.{}'.format(index, fmt))
+        renderer.save(filename, trace_visits(trial, renderer.dim), trace_paths(trial))
+        filenames.append(filename)
+    return filenames
+
+
+if __name__ == '__main__':
+    '''
+    This script renders a maze or all trials of a trace file without a
+    display:
+    python render.py maze_file output [cell]
+    python render.py trace_file directory [format] [cell]
+    e.g. python render.py test_maze_01.txt maze_01.svg
+    e.g. python render.py traces.npz renders png 8
+    '''
+
+    if sys.argv[1].endswith('.npz'):
+        fmt = sys.argv[3] if len(sys.argv) > 3 else 'png'
+        cell = int(sys.argv[4]) if len(sys.argv) > 4 else 8
+        filenames = export_trials(TraceFile(sys.argv[1]), sys.argv[2], fmt, cell)
+        print("Rendered", len(filenames), "trials to", sys.argv[2])
+    else:
+        cell = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+        Renderer(Maze(sys.argv[1]), cell).save(sys.argv[2])
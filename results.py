@@ -0,0 +1,123 @@
+import os
+import json
+import pandas as pd
+
+# results columns for dataframe, seed is only kept in the json lines file
+pdcols = ['Alg', 'Trip', 'Maze', 'Run1', 'Run2', 'Score', 'Coverage']
+columns = pdcols + ['Seed']
+
+
+def trial_key(maze, alg, attempt, seed):
+    '''
+    Returns the key identifying a trial of a sweep.
+    '''
+    return (maze, alg, attempt, seed)
+
+
+def read_records(filename):
+    '''
+    Returns the records of a json lines results file. A last line which was
+    not completely written, e.g. due to a crash, is ignored.
+    '''
+    records = []
+    if not os.path.exists(filename):
+        return records
+    with open(filename, 'r') as f_in:
+        for line in f_in:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+    return records
+
+
+class ResultSink(object):
+    '''
+    Streaming sink appending one json record per trial to a json lines file.
+    Records are written in batches of batch_size, so at most one batch is
+    lost on a crash. With resume set the trials already in the file are
+    kept and can be skipped by checking done, otherwise the file is started
+    from scratch. Incomplete trials are recorded with Run2, Score and
+    Coverage None so they are not run again when resuming.
+    '''
+
+    def __init__(self, filename, batch_size=100, resume=False):
+        self.filename = filename
+        self.batch_size = batch_size
+        self.buffer = []
+        self.keys = set()
+        if resume:
+            for record in read_records(filename):
+                self.keys.add(trial_key(record['Maze'], record['Alg'], record['Trip'], record['Seed']))
+            # drop a partly written last line before appending
+            self.truncate_partial()
+            self.file = open(filename, 'a')
+        else:
+            self.file = open(filename, 'w')
+
+    def truncate_partial(self):
+        '''
+        Cut the file after its last complete line.
+        '''
+        if not os.path.exists(self.filename):
+            return
+        with open(self.filename, 'rb+') as f:
+            data = f.read()
+            if data and not data.endswith(b'\n'):
+                f.truncate(data.rfind(b'\n') + 1)
+
+    def done(self, maze, alg, attempt, seed):
+        '''
+        Returns whether the trial is already recorded.
+        '''
+        return trial_key(maze, alg, attempt, seed) in self.keys
+
+    def write(self, row, seed=None):
+        '''
+        Record a trial given as row [alg, attempt, maze, run1, run2, score,
+        coverage] like the rows of the dataframe.
+        '''
+        record = dict(zip(columns, list(row) + [seed]))
+        self.buffer.append(json.dumps(record))
+        self.keys.add(trial_key(record['Maze'], record['Alg'], record['Trip'], seed))
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        '''
+        Write the buffered records to the file.
+        '''
+        if self.buffer:
+            self.file.write('\n'.join(self.buffer) + '\n')
+            self.buffer = []
+        self.file.flush()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def export(filename, output='results.json'):
+    '''
+    Write the completed trials of a json lines results file in the format
+    of all_results.json, i.e. a dataframe of pdcols as json with orient
+    'index'. A trial recorded more than once is exported with its last
+    record. Returns the dataframe.
+    '''
+    records = {}
+    for record in read_records(filename):
+        key = trial_key(record['Maze'], record['Alg'], record['Trip'], record['Seed'])
+        records.pop(key, None)
+        records[key] = record
+    rows = [[record[col] for col in pdcols] for record in records.values()
+            if record['Run2'] is not None]
+    df = pd.DataFrame(rows, columns=pdcols)
+    with open(output, 'w') as f:
+        f.write(df.to_json(orient='index'))
+    return df
@@ -1,69 +1,354 @@
 import random
 import itertools
 import copy
+import heapq
+import functools
+import time
+from collections import OrderedDict
 import numpy as np
 from enum import IntEnum
+from planner import IncrementalPlanner
+
+
+# h-value kinds of h_cost_table
+h_kinds = ["segments", "moves"]
+
+
+@functools.lru_cache(maxsize=1024)
+def h_cost_table(maze_dim, max_move, goals, kind="segments"):
+    '''
+    Funtion to generate h-value table of given maze dimension and goals given
+    as frozenset of (x, y) tuples. With kind "segments" the h-value of a node
+    is the lowest number of straight moves of up to max_move nodes in x and y
+    direction towards one of the goals. With kind "moves" the number of nodes
+    to travel is added, which is the lowest cost of find_best_path where each
+    move costs one timestep plus its number of nodes, i.e. the exact cost if
+    all unknown walls were open. Tables are cached and returned read-only.
+    '''
+
+    coords = np.arange(maze_dim)
+    goals = np.array(sorted(goals)).reshape(-1, 2)
+    # |dx| per goal and x, respectively |dy| per goal and y
+    dx = np.abs(coords - goals[:, 0:1])
+    dy = np.abs(coords - goals[:, 1:2])
+    # ceil(|dx| / max_move) and ceil(|dy| / max_move)
+    distx = -(-dx // max_move)
+    disty = -(-dy // max_move)
+    if kind == "moves":
+        distx = distx + dx
+        disty = disty + dy
+    heuristic = (distx[:, :, None] + disty[:, None, :]).min(axis=0)
+    heuristic.flags.writeable = False
+
+    return heuristic
+
+
+# common dictionaries for maze, robot movement and sensing.
+dir_sensors = {
+    "u": ["l", "u", "r"],
+    "r": ["u", "r", "d"],
+    "d": ["r", "d", "l"],
+    "l": ["d", "l", "u"],
+    "up": ["l", "u", "r"],
+    "right": ["u", "r", "d"],
+    "down": ["r", "d", "l"],
+    "left": ["d", "l", "u"],
+}
+dir_move = {"u": [0, 1], "r": [1, 0], "d": [0, -1], "l": [-1, 0]}
+dir_reverse = {
+    "u": "d",
+    "r": "l",
+    "d": "u",
+    "l": "r",
+    "up": "d",
+    "right": "l",
+    "down": "u",
+    "left": "r",
+}
+rotation = [-90, 0, 90]
+dir_index = {
+    "u": 0,
+    "r": 1,
+    "d": 2,
+    "l": 3,
+    "up": 0,
+    "right": 1,
+    "down": 2,
+    "left": 3,
+}
+dir_int = {
+    "u": 1,
+    "r": 2,
+    "d": 4,
+    "l": 8,
+    "up": 1,
+    "right": 2,
+    "down": 4,
+    "left": 8,
+}
+
+# Node status: closed not yet detected, open is detected but not 
+# visited while done is visited. 
+nstatus = {"closed": 0, "open": 1, "done": 2}
+
+# list of all validated run1 algorithms 
+algs = {"SHORT_100": 100, "SHORT_90": 90, "SHORT_80": 80, "SHORT_70": 70, "SHORT_GOALS": 0, "HEURISTIC_100": 100, "HEURISTIC_90": 90, "HEURISTIC_80": 80, "HEURISTIC_70": 70, "HEURISTIC_GOALS": 0}
+
+
+class Page(IntEnum):
+    '''
+    Page enum to address particular table in the stacked tables of the map.
+    '''
+    walls = 0
+    h1 = 1
+    g1 = 2
+    f1 = 3
+    nstatus1 = 4
+    visits = 5
+
+
+# data type of each page, walls fit in 4 bits and node status in 2 bits
+page_dtypes = {
+    Page.walls: np.uint8,
+    Page.h1: np.int16,
+    Page.g1: np.int32,
+    Page.f1: np.int32,
+    Page.nstatus1: np.int8,
+    Page.visits: np.int32,
+}
+
+
+class NodeSet(object):
+    '''
+    Insertion ordered set of nodes given as [x, y]. Nodes are kept in a dict
+    keyed by their (x, y) tuple, so adding, removing and membership tests
+    take O(1) while the iteration order stays stable.
+    '''
+
+    __slots__ = ("nodes", "cache")
+
+    def __init__(self, nodes=()):
+        self.nodes = {}
+        self.cache = None
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node):
+        self.nodes[(node[0], node[1])] = node
+        self.cache = None
+
+    def discard(self, node):
+        if self.nodes.pop((node[0], node[1]), None) is not None:
+            self.cache = None
+
+    def __contains__(self, node):
+        return (node[0], node[1]) in self.nodes
+
+    def __iter__(self):
+        return iter(self.nodes.values())
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def array(self):
+        '''
+        Returns the nodes in iteration order as (n, 2) array which is cached
+        until the set changes.
+        '''
+        if self.cache is None:
+            self.cache = np.array(list(self.nodes), dtype=int).reshape(-1, 2)
+        return self.cache
+
+
+class PlanCache(object):
+    '''
+    Least recently used cache of search results keyed on the search inputs
+    and the map version they were computed on. Hits and misses are counted.
+    '''
+
+    __slots__ = ("maxsize", "entries", "hits", "misses")
+
+    def __init__(self, maxsize=16):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key, entry):
+        if self.maxsize <= 0:
+            return
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self.entries)}
+
+
+# sub-buckets per power of two of the latency histogram, the bucket width
+# is at most 1/latency_sub_buckets of its values
+latency_sub_bits = 3
+latency_sub_buckets = 2 ** latency_sub_bits
+
+
+def latency_bucket(nanoseconds):
+    '''
+    Returns the index of the latency histogram bucket of a duration.
+    Durations below latency_sub_buckets nanoseconds have a bucket each,
+    every further power of two is split into latency_sub_buckets buckets
+    of equal width.
+    '''
+    nanoseconds = max(int(nanoseconds), 0)
+    if nanoseconds < latency_sub_buckets:
+        return nanoseconds
+    exponent = nanoseconds.bit_length() - 1
+    sub = (nanoseconds >> (exponent - latency_sub_bits)) - latency_sub_buckets
+    return latency_sub_buckets * (exponent - latency_sub_bits + 1) + sub
+
+
+def bucket_range(index):
+    '''
+    Returns the lowest and highest duration in nanoseconds of a latency
+    histogram bucket.
+    '''
+    if index < latency_sub_buckets:
+        return index, index
+    exponent = index // latency_sub_buckets + latency_sub_bits - 1
+    width = 1 << (exponent - latency_sub_bits)
+    low = (latency_sub_buckets + index % latency_sub_buckets) * width
+    return low, low + width - 1
+
+
+class RobotStats(object):
+    '''
+    Opt-in instrumentation of a robot. For each next_move the number of
+    searches called, the number of open nodes (frontier) and the wall-time
+    in a histogram of nanosecond buckets (see latency_bucket) are recorded,
+    for each search which was not cached the number of nodes expanded and
+    pushed.
+    '''
+
+    __slots__ = ("searches", "frontier", "search_kinds", "expanded", "pushed",
+                 "latency", "calls")
+
+    def __init__(self):
+        self.searches = []
+        self.frontier = []
+        self.search_kinds = []
+        self.expanded = []
+        self.pushed = []
+        # bucket i counts the calls taking bucket_range(i) nanoseconds
+        self.latency = [0] * (latency_bucket(2 ** 63 - 1) + 1)
+        # searches called during the running next_move
+        self.calls = 0
+
+    def begin_move(self, frontier):
+        self.calls = 0
+        self.frontier.append(frontier)
+
+    def end_move(self, nanoseconds):
+        self.searches.append(self.calls)
+        self.latency[latency_bucket(min(nanoseconds, 2 ** 63 - 1))] += 1
+
+    def add_search(self, kind, expanded, pushed):
+        self.search_kinds.append(kind)
+        self.expanded.append(expanded)
+        self.pushed.append(pushed)
+
+    def percentile(self, p):
+        '''
+        Returns the middle of the latency bucket containing the p-th
+        percentile of next_move wall-time in seconds, 0 if there are none.
+        The result is within 1/16 of the exact percentile.
+        '''
+        total = sum(self.latency)
+        if not total:
+            return 0
+        count = 0
+        for idx, bucket in enumerate(self.latency):
+            count += bucket
+            if count >= p / 100 * total:
+                low, high = bucket_range(idx)
+                return (low + high) / 2 / 1e9
+        return 0
+
+    def summary(self):
+        '''
+        Returns a dict of totals, means and maxima of the recorded values.
+        '''
+        def describe(values):
+            if not values:
+                return {"total": 0, "mean": 0, "max": 0}
+            return {"total": sum(values), "mean": sum(values) / len(values), "max": max(values)}
+
+        return {
+            "moves": len(self.searches),
+            "searches_per_move": describe(self.searches),
+            "searches": {kind: self.search_kinds.count(kind) for kind in set(self.search_kinds)},
+            "expanded": describe(self.expanded),
+            "pushed": describe(self.pushed),
+            "frontier": describe(self.frontier),
+            "latency_p50": self.percentile(50),
+            "latency_p99": self.percentile(99),
+        }
 
 
 class Robot(object):
-    def __init__(self, maze_dim, alg='', logger=None):
+    # constant tables shared by all robots
+    dir_sensors = dir_sensors
+    dir_move = dir_move
+    dir_reverse = dir_reverse
+    rotation = rotation
+    dir_index = dir_index
+    dir_int = dir_int
+    nstatus = nstatus
+    algs = algs
+    Page = Page
+
+    __slots__ = (
+        "maze_dim", "maze_center", "max_move", "start", "start_heading",
+        "goals", "goal_set", "maps", "runs", "search_closed", "search_status", "search_g",
+        "search_parent", "search_steps", "unreachable", "search_unreached",
+        "pos", "open_nodes", "goal_found", "run2", "nodes_done", "coverage",
+        "timesteps",
+        "timesteps_counter", "alg", "planner", "map_version", "plan_cache",
+        "heuristic", "expanded", "expanded_total", "rng", "stats", "logger",
+    )
+
+    def __init__(self, maze_dim, alg='', logger=None, incremental=False,
+                 plan_cache_size=0, heuristic="segments", seed=None,
+                 stats=False):
         """
         Initialization function to set up attributes that your robot
         will use to learn and navigate the maze. Some initial attributes are
         provided based on common information, including the size of the maze
-        the robot is placed in.
+        the robot is placed in. With incremental set the open node for run1
+        exploration is selected by an IncrementalPlanner which keeps its
+        search state across the steps. Plans of find_best_path can be
+        cached for the map version they were computed on, plan_cache_size
+        limits the number of cached plans and is 0 (off) by default as a
+        robot rarely repeats a search on the same map. heuristic
+        selects the h-value kind used by find_best_path, "segments" or the
+        tighter "moves" (see h_cost_table). All random choices are drawn
+        from a generator of the robot's own, reproducible with a seed and
+        seeded from the operating system otherwise. With stats set searches, frontier sizes and
+        next_move latency are recorded in self.stats (see RobotStats). Debug
+        messages are logged if a logger is given.
         """
 
-        # common dictionaries for maze, robot movement and sensing.
-        self.dir_sensors = {
-            "u": ["l", "u", "r"],
-            "r": ["u", "r", "d"],
-            "d": ["r", "d", "l"],
-            "l": ["d", "l", "u"],
-            "up": ["l", "u", "r"],
-            "right": ["u", "r", "d"],
-            "down": ["r", "d", "l"],
-            "left": ["d", "l", "u"],
-        }
-        self.dir_move = {"u": [0, 1], "r": [1, 0], "d": [0, -1], "l": [-1, 0]}
-        self.dir_reverse = {
-            "u": "d",
-            "r": "l",
-            "d": "u",
-            "l": "r",
-            "up": "d",
-            "right": "l",
-            "down": "u",
-            "left": "r",
-        }
-        self.rotation = [-90, 0, 90]
-        self.dir_int = {
-            "u": 1,
-            "r": 2,
-            "d": 4,
-            "l": 8,
-            "up": 1,
-            "right": 2,
-            "down": 4,
-            "left": 8,
-        }
-
-        # Page enum to address particular table in stacked table/array
-        class Page(IntEnum):
-            walls = 0
-            h1 = 1
-            g1 = 2
-            f1 = 3
-            nstatus1 = 4
-            visits = 5
-            h2 = 6
-            g2 = 7
-            f2 = 8
-            nstatus2 = 9
-        
-        # Node status: closed not yet detected, open is detected but not 
-        # visited while done is visited. 
-        self.nstatus = {"closed": 0, "open": 1, "done": 2}
+        # source of random choices, reproducible with a seed. A generator
+        # instead of the random module keeps the robot picklable.
+        self.rng = random.Random(seed)
 
         # maze and robot specifications
         self.maze_dim = maze_dim
@@ -75,12 +360,30 @@ class Robot(object):
             [product[0], product[1]]
             for product in itertools.product(self.maze_center, repeat=2)
         ]
+        self.goal_set = {(int(goal[0]), int(goal[1])) for goal in self.goals}
+
+        # create a map contaning stacked n*n arrays / tables, each with the
+        # data type of its page
+        self.maps = [
+            np.zeros((self.maze_dim, self.maze_dim), dtype=page_dtypes[page])
+            for page in self.Page
+        ]
+        # number of open nodes to the nearest known wall for each direction
+        # in the order of self.dir_index, updated whenever a wall is opened
+        self.runs = np.zeros((4, self.maze_dim, self.maze_dim), dtype=np.int16)
+
+        # flat buffers for A* reused across find_best_path calls. A node 
+        # [x, y] is addressed by its flat index x * maze_dim + y so moving
+        # one node in a direction adds the respective step to the index.
+        self.search_closed = [self.nstatus["closed"]] * (self.maze_dim * self.maze_dim)
+        self.search_status = list(self.search_closed)
+        self.search_g = [0] * (self.maze_dim * self.maze_dim)
+        self.search_parent = [-1] * (self.maze_dim * self.maze_dim)
+        self.search_steps = {"u": 1, "r": self.maze_dim, "d": -1, "l": -self.maze_dim}
+        # timesteps to a node which can not be reached in find_cost_map
+        self.unreachable = self.maze_dim * self.maze_dim
+        self.search_unreached = [self.unreachable] * (self.maze_dim * self.maze_dim)
 
-        # create a map contaning stacked n*n array / table
-        self.Page = Page
-        self.maps = np.full(
-            (len(self.Page), self.maze_dim, self.maze_dim), 0, dtype=int
-        )
         # generate h_cost and store in h-cost array in the map
         self.generate_h_cost(self.goals, self.maps[self.Page.h1])
 
@@ -96,51 +399,63 @@ class Robot(object):
         self.maps[self.Page.visits][tuple(self.pos['node'])] = 1
         self.maps[self.Page.nstatus1][tuple(self.pos["node"])] = self.nstatus["done"]
 
-        # dynamic list of open nodes to be explored in run1
-        self.open_nodes = []
-        self.open_nodes.append(self.pos["node"])
+        # h-value kind of find_best_path and number of nodes it expanded in
+        # the last search and in total
+        if heuristic not in h_kinds:
+            raise ValueError("Unknown heuristic {}, use one of {}.".format(heuristic, h_kinds))
+        self.heuristic = heuristic
+        self.expanded = 0
+        self.expanded_total = 0
+
+        # version of the known walls, incremented whenever a wall is opened,
+        # and cache of search results computed on it
+        self.map_version = 0
+        self.plan_cache = PlanCache(plan_cache_size)
+
+        # dynamic set of open nodes to be explored in run1
+        self.open_nodes = NodeSet([self.pos["node"]])
 
         # robots state and counter during run1 and run2 movement
         self.goal_found = False
         self.run2 = False
+        self.nodes_done = 1
         self.coverage = 0
         self.timesteps = []
         self.timesteps_counter = 0
 
-        # list of all validated run1 algorithms 
-        self.algs = {"SHORT_100": 100, "SHORT_90": 90, "SHORT_80": 80, "SHORT_70": 70, "SHORT_GOALS": 0, "HEURISTIC_100": 100, "HEURISTIC_90": 90, "HEURISTIC_80": 80, "HEURISTIC_70": 70, "HEURISTIC_GOALS": 0}
         # set default algorithm if none given during robots initialization
         if alg in self.algs.keys():
             self.alg = alg
         else:
             self.alg = "SHORT_90"
 
-        #enable or disable debug logging
-        self.debug_logging = False
-        self.logger = None
-        if self.debug_logging and logger:
-            self.logger = logger
+        # optional incremental planner rooted at the open nodes
+        self.planner = None
+        if incremental:
+            self.planner = IncrementalPlanner(self.maze_dim, self.max_move, self.rng)
+            for node in self.open_nodes:
+                self.planner.add_source(node, self.frontier_cost(node))
 
+        # optional instrumentation and debug logging
+        self.stats = RobotStats() if stats else None
+        self.logger = logger
 
-    def generate_h_cost(self, goals, heuristic=[]):
+
+    def generate_h_cost(self, goals, heuristic=None, kind="segments"):
         '''
         Funtion to generate and populate h-value of given maze dimension, start 
-        and goals.
+        and goals. The cached read-only table is returned and copied to 
+        heuristic if given. See h_cost_table for the kind of h-value.
         '''
 
-        dist = []
-        for x in range(self.maze_dim):
-            for y in range(self.maze_dim):
-                dist = []
-                for goal in goals:
-                    div, rem = divmod(abs(goal[0] - x), self.max_move)
-                    distx = div + 1 if rem != 0 else div
-                    div, rem = divmod(abs(goal[1] - y), self.max_move)
-                    disty = div + 1 if rem != 0 else div
-                    dist.append(distx + disty)
-                    heuristic[x][y] = min(dist)
+        table = h_cost_table(
+            self.maze_dim, self.max_move,
+            frozenset((int(goal[0]), int(goal[1])) for goal in goals), kind
+            )
+        if heuristic is not None:
+            heuristic[:] = table
 
-        return
+        return table
 
     def next_move(self, sensors):
         """
@@ -151,6 +466,22 @@ class Robot(object):
         To end run1 tuple ('Reset', 'Reset') will be returned. 
         """
 
+        if self.stats is None:
+            return self.decide_move(sensors)
+
+        start = time.perf_counter_ns()
+        self.stats.begin_move(len(self.open_nodes))
+        move = self.decide_move(sensors)
+        self.stats.end_move(time.perf_counter_ns() - start)
+
+        return move
+
+    def decide_move(self, sensors):
+        '''
+        Function to update the maps with the sensor readings and to return
+        the next move, see next_move.
+        '''
+
         rotation = 0
         movement = 0
 
@@ -169,49 +500,60 @@ class Robot(object):
         # once consecutive movements done identify next node with lowest 
         # f_cost for the next exploration
         if self.timesteps_counter == 0:
-            # selection list
-            timesteps = []
-            # node to be explored
+            # node to be explored and the path towards it
             node_to_go =  None
-            # go to each node in the open list
-            for idx, node in enumerate(self.open_nodes):
-                # if node is the goal pick this for next exploration/visit
-                if node in self.goals:
-                    node_to_go = node
-                    break
-                # calculate g_value for heuristic-turn algorithm
+            path = None
+            cost_map = None
+            # if a node in the open list is the goal pick this for next 
+            # exploration/visit
+            if any(goal in self.open_nodes for goal in self.goal_set):
+                for node in self.open_nodes:
+                    if (node[0], node[1]) in self.goal_set:
+                        node_to_go = node
+                        break
+            # the incremental planner provides the path towards the open node 
+            # with the lowest timesteps directly
+            if node_to_go is None and self.planner is not None:
+                if self.stats is not None:
+                    self.stats.calls += 1
+                    expanded, updated = self.planner.expanded, self.planner.updated
+                path = self.planner.find_path(self.pos["node"])
+                if self.stats is not None:
+                    self.stats.add_search("planner", self.planner.expanded - expanded,
+                                          self.planner.updated - updated)
+                if path is not None:
+                    node_to_go = path[-1]
+            # otherwise one sweep gives the timesteps from the robot to every 
+            # node
+            elif node_to_go is None and self.open_nodes:
+                cost_map = self.find_cost_map(self.pos["node"])
+                nodes = self.open_nodes.array()
+                timesteps = cost_map[nodes[:, 0], nodes[:, 1]]
+                reachable = timesteps != self.unreachable
+                # add h_cost to the timesteps for heuristic-turn algorithm
                 if self.alg in ["HEURISTIC_100", "HEURISTIC_90", "HEURISTIC_80", "HEURISTIC_70", "HEURISTIC_GOALS"]:
-                    timestep = (self.find_best_path(self.pos["node"], 
-                                self.pos["heading"], [node])
-                                + self.maps[self.Page.h1][tuple(node)]
-                                )
-                # calculate g_value for short-turn algorithm
-                else:
-                    timestep = self.find_best_path(
-                        self.pos["node"], self.pos["heading"], [node]
-                        )
-                # add the first node as the lowest f_cost for the time being to 
-                # the selection list.
-                if not timesteps:
-                    timesteps.append({"node":node, "timestep": timestep})
-                    continue
-                # replace previous node with other having lower f_cost
-                if timestep < timesteps[0]["timestep"]:
-                    timesteps.clear()
-                    timesteps.append({"node":node, "timestep": timestep})
-                # if other node having f_cost add to the selection list 
-                if timestep == timesteps[0]["timestep"]:
-                    timesteps.append({"node":node, "timestep": timestep})
+                    timesteps = timesteps + self.maps[self.Page.h1][nodes[:, 0], nodes[:, 1]]
+                # choose one node randomly if several nodes having same lowest
+                # timesteps
+                if reachable.any():
+                    lowest = timesteps[reachable].min()
+                    selection = np.flatnonzero(reachable & (timesteps == lowest))
+                    node_to_go = nodes[self.rng.choice(selection)].tolist()
 
             # select next node for further exploration
             if node_to_go is None:
-                if timesteps:
-                    node_to_go = random.choice(timesteps)["node"]
-                else:
-                    print("all nodes are explored but goal is not found so robot stays at the current position")
-                    return 0,0
-            # run a-search and get shortest distance of nodes under evaluation.
-            self.timesteps_counter = self.find_best_path(self.pos["node"], self.pos["heading"], [node_to_go])
+                print("all nodes are explored but goal is not found so robot stays at the current position")
+                return 0,0
+            # convert the path of nodes under evaluation to timesteps or 
+            # extract it from the sweep
+            if path is not None:
+                self.timesteps = []
+                self.build_timesteps(path, self.pos["heading"])
+                self.timesteps_counter = len(self.timesteps)
+            else:
+                if cost_map is None:
+                    self.find_cost_map(self.pos["node"])
+                self.timesteps_counter = self.extract_plan(self.pos["node"], self.pos["heading"], node_to_go)
 
         # get timesteps information of actual running index 
         rotation, movement, heading, move_to = self.timesteps[
@@ -227,6 +569,17 @@ class Robot(object):
 
         return rotation, movement
 
+    def frontier_cost(self, node):
+        '''
+        Function to return the cost added to the timesteps of an open node
+        when selecting the next node for exploration. Heuristic-turn 
+        algorithms add the h_cost of the node.
+        '''
+
+        if self.alg in ["HEURISTIC_100", "HEURISTIC_90", "HEURISTIC_80", "HEURISTIC_70", "HEURISTIC_GOALS"]:
+            return int(self.maps[self.Page.h1][tuple(node)])
+        return 0
+
     def is_goal_cov_reached(self):
         '''
         Funtion to check if the targeted exploration coverage achieved and the 
@@ -250,60 +603,82 @@ class Robot(object):
         are updated.
         '''
 
-        # mark actual robots node as explored/done and remove the node from 
-        # the open_nodes list 
-        self.maps[self.Page.nstatus1][tuple(self.pos["node"])] = self.nstatus["done"]
-        for idx,item in enumerate(self.open_nodes):
-            if item == self.pos["node"]:
-                self.open_nodes.pop(idx)
+        # mark actual robots node as explored/done, count it for the 
+        # exploration coverage and remove the node from the open_nodes set
+        if self.maps[self.Page.nstatus1][tuple(self.pos["node"])] != self.nstatus["done"]:
+            self.maps[self.Page.nstatus1][tuple(self.pos["node"])] = self.nstatus["done"]
+            self.nodes_done += 1
+        self.open_nodes.discard(self.pos["node"])
+        if self.planner is not None:
+            self.planner.remove_source(self.pos["node"])
 
         # if goal is visited set robot state accordingly
-        if (self.pos['node'] in self.goals) and (not self.goal_found):
+        if (not self.goal_found) and (tuple(self.pos['node']) in self.goal_set):
             self.goal_found = True
 
         # calculate exploration coverage
-        node_done = np.count_nonzero(self.maps[self.Page.nstatus1] == self.nstatus["done"]) 
-        self.coverage = round((node_done / (self.maze_dim * self.maze_dim)) * 100, 1)
+        self.coverage = round((self.nodes_done / (self.maze_dim * self.maze_dim)) * 100, 1)
 
         # Set walls value, g_cost, and h_cost for nodes and its adjacent as  
         # indicated by the sensors as either passable or blocked from 
-        # respective direction  
+        # respective direction. Each sensor ray is applied at once to the
+        # nodes along it starting with the robots node.
+        walls = self.maps[self.Page.walls]
+        nstatus1 = self.maps[self.Page.nstatus1]
+        g1 = self.maps[self.Page.g1]
+        x, y = self.pos["node"]
         for idx, dist in enumerate(sensors):
-            heading = self.dir_sensors[self.pos["heading"]][idx]
             # skipped if sensor gives 0 distance
-            for i in range(dist):
-                current_node = (np.array(self.pos["node"]) + 
-                (i * np.array(self.dir_move[heading]))).tolist()
-                # set the wall value
-                if (self.maps[self.Page.walls][tuple(current_node)] & self.dir_int[heading]) == 0:
-                    self.maps[self.Page.walls][tuple(current_node)] += self.dir_int[heading]
-                
-                # get adjacent node
-                next_node = (np.array(current_node) + np.array(self.dir_move[heading])).tolist()
-                
-                # select only adjacent node if it is new in the list
-                if (self.maps[self.Page.nstatus1][tuple(next_node)]== self.nstatus["closed"]):
-                    # set the wall value
-                    if (self.maps[self.Page.walls][tuple(next_node)] & self.dir_int[self.dir_reverse[heading]]) == 0:
-                        self.maps[self.Page.walls][tuple(next_node)] += self.dir_int[self.dir_reverse[heading]]
-                    # calculate g-cost for each permissible node
-                    self.maps[self.Page.g1][tuple(next_node)] = (
-                        self.maps[self.Page.g1][tuple(current_node)] + 1
-                    )
-                    # calculate f-cost accordingly
-                    self.maps[self.Page.f1][tuple(next_node)] = (
-                        self.maps[self.Page.h1][tuple(next_node)]
-                        + self.maps[self.Page.g1][tuple(next_node)]
-                    )
-                    # add newly detected nodes to the list
-                    self.open_nodes.append(next_node)
-                    self.maps[self.Page.nstatus1][tuple(next_node)] = self.nstatus["open"]
-                # Update the wall only if adjacent node already in the list
-                else:
-                    if ( self.maps[self.Page.walls][tuple(next_node)] & 
-                        self.dir_int[self.dir_reverse[heading]]) == 0:
-                        self.maps[self.Page.walls][tuple(next_node)] += self.dir_int[self.dir_reverse[heading]]
-        
+            if dist == 0:
+                continue
+            heading = self.dir_sensors[self.pos["heading"]][idx]
+            reverse = self.dir_reverse[heading]
+            steps = np.arange(dist + 1)
+            xs = x + steps * self.dir_move[heading][0]
+            ys = y + steps * self.dir_move[heading][1]
+
+            # nothing new if all walls along the ray are already open
+            opened = (walls[xs[:-1], ys[:-1]] & self.dir_int[heading]) == 0
+            if not opened.any():
+                continue
+            self.map_version += 1
+
+            # set the wall values of the nodes and of their adjacent nodes in
+            # reverse direction
+            walls[xs[:-1], ys[:-1]] |= self.dir_int[heading]
+            walls[xs[1:], ys[1:]] |= self.dir_int[reverse]
+            # the ray ends at a wall so the run of each node is its distance
+            # to the end, nodes behind the robot extend the run of its node
+            self.runs[self.dir_index[heading]][xs[1:-1], ys[1:-1]] = dist - steps[1:-1]
+            self.update_runs(self.pos["node"], heading)
+            # runs in reverse direction continue the run of the robots node
+            reverse_runs = self.runs[self.dir_index[reverse]]
+            reverse_runs[xs[1:], ys[1:]] = reverse_runs[x, y] + steps[1:]
+            if self.planner is not None:
+                for i in np.flatnonzero(opened):
+                    self.planner.open_wall([xs[i], ys[i]], heading)
+
+            # newly detected nodes continue the g_cost of the last node before
+            # them which was already detected
+            closed = nstatus1[xs, ys] == self.nstatus["closed"]
+            if not closed.any():
+                continue
+            last_known = np.maximum.accumulate(np.where(closed, 0, steps))
+            g_ray = g1[xs, ys]
+            g1[xs, ys] = g_ray[last_known] + steps - last_known
+            # calculate f-cost accordingly and add newly detected nodes to the
+            # open nodes
+            new_xs = xs[closed]
+            new_ys = ys[closed]
+            self.maps[self.Page.f1][new_xs, new_ys] = (
+                self.maps[self.Page.h1][new_xs, new_ys] + g1[new_xs, new_ys]
+            )
+            nstatus1[new_xs, new_ys] = self.nstatus["open"]
+            for node in np.stack((new_xs, new_ys), axis=1).tolist():
+                self.open_nodes.add(node)
+                if self.planner is not None:
+                    self.planner.add_source(node, self.frontier_cost(node))
+
         return
 
     def find_best_path(self, start, heading, targets):
@@ -311,31 +686,54 @@ class Robot(object):
         This is A-search algorithm to find the best optimal path from 
         a start to targets given actual knowledge of the maze. Number of 
         timesteps will be returned to the caller and the path of movemevent and 
-        rotation are stored as robots attribute timesteps self.timesteps
+        rotation are stored as robots attribute timesteps self.timesteps.
+        Open nodes are kept in a binary heap keyed on (f_cost, h_cost, random
+        tie-break) and nodes are addressed by their flat index x * maze_dim + y
+        in the reusable search buffers.
         '''
-        
-        # running list of open nodes for expanding 
-        open_nodes = []
 
-        # initialize all required local variables
-        target_found = False
-        single_target_node =[]
-        parents = np.ndarray(shape=(self.maze_dim, self.maze_dim), dtype=object)
-        curr_node = start
-        curr_heading = heading
+        if self.stats is not None:
+            self.stats.calls += 1
 
-        # populate heuristic value
+        # reuse the plan of the same search on the same map version
+        key = (
+            "path", tuple(start), heading, self.heuristic,
+            frozenset((int(target[0]), int(target[1])) for target in targets),
+            self.map_version
+        )
+        plan = self.plan_cache.get(key)
+        if plan is not None:
+            self.reset_pathfinder_maps()
+            self.timesteps = list(plan)
+            self.expanded = 0
+            return len(self.timesteps)
+
+        # node status codes of the flat status buffer
+        closed = self.nstatus["closed"]
+        opened = self.nstatus["open"]
+        done = self.nstatus["done"]
+
+        # populate heuristic value and reset the search buffers
         self.reset_pathfinder_maps()
-        self.generate_h_cost(targets, self.maps[self.Page.h2])
-
-        # set g_cost 0 for start node
-        self.maps[self.Page.g2][tuple(curr_node)] = 0
+        h_cost = self.generate_h_cost(targets, kind=self.heuristic).ravel().tolist()
+        runs = self.runs.reshape(4, -1).tolist()
+        g_cost = self.search_g
+        parents = self.search_parent
+        status = self.search_status
+        target_nodes = {self.flat_index(target) for target in targets}
+
+        self.expanded = 0
+        pushed = 0
+        # heap of open nodes for expanding, entries are
+        # (f_cost, h_cost, tie-break, node)
+        open_nodes = []
+        target_node = None
 
-        # calculate f_cost = g_cost + h_cost for start node
-        self.maps[self.Page.f2][tuple(curr_node)] = self.maps[self.Page.g2][tuple(curr_node)] + self.maps[self.Page.h2][tuple(curr_node)]
-        # add start node to open list
-        open_nodes.append(curr_node)
-        self.maps[self.Page.nstatus2][tuple(curr_node)] = self.nstatus["open"]
+        # set g_cost 0 for start node and mark it as open
+        start_node = self.flat_index(start)
+        curr_node = start_node
+        g_cost[curr_node] = 0
+        status[curr_node] = opened
 
         # logging
         if self.logger:
@@ -343,82 +741,148 @@ class Robot(object):
 
         # Expand nodes from start until target is found. Thereby fastest path 
         # indicated by low f_cost needs to be prioritized for expansion.
-        while not target_found:
-            for heading in self.dir_move.keys():
-                distance = self.dist_to_wall(curr_node, heading)
-            # cap distance until self.max_move
-                if distance > self.max_move:
-                    distance = self.max_move
-                
+        while target_node is None:
+            self.expanded += 1
+            g_next = g_cost[curr_node] + 1
+            for direction, step in self.search_steps.items():
+                # cap distance until self.max_move
+                distance = min(runs[self.dir_index[direction]][curr_node], self.max_move)
+                next_node = curr_node
                 for i in range(1, distance + 1):
-                    next_node = (np.array(curr_node) + (i * np.array(self.dir_move[heading]))).tolist()
+                    next_node += step
                     # skip neighbour node if already evaluated(done)
-                    if self.maps[self.Page.nstatus2][tuple(next_node)] == self.nstatus["done"]:
+                    if status[next_node] == done:
                         break
-                    # update g_cost if new calculated value smaller than stored 
-                    # or no value stored before
-                    if (self.maps[self.Page.g2][tuple(next_node)] > (self.maps[self.Page.g2][tuple(curr_node)] + 1 + i )) or (self.maps[self.Page.nstatus2][tuple(next_node)] == self.nstatus["closed"]):
-                        
-                        self.maps[self.Page.g2][tuple(next_node)] = self.maps[self.Page.g2][tuple(curr_node)] + 1 + i
-                        # calculate f_cost = g_cost + h_cost for start node
-                        self.maps[self.Page.f2][tuple(next_node)] = self.maps[self.Page.g2][tuple(next_node)] + self.maps[self.Page.h2][tuple(next_node)]
-                        # add parent node of the current node in the table
-                        parents[tuple(next_node)] = curr_node
-                        # add  node to open list
-                    if self.maps[self.Page.nstatus2][tuple(next_node)] == self.nstatus["closed"]:
-                        open_nodes.append(next_node)
-                        self.maps[self.Page.nstatus2][tuple(next_node)] = self.nstatus["open"]
+                    # update g_cost if new calculated value smaller than stored
+                    # or no value stored before and push the node to the heap
+                    if status[next_node] == closed or g_cost[next_node] > g_next + i:
+                        g_cost[next_node] = g_next + i
+                        parents[next_node] = curr_node
+                        status[next_node] = opened
+                        pushed += 1
+                        heapq.heappush(open_nodes, (
+                            g_next + i + h_cost[next_node], h_cost[next_node],
+                            self.rng.random(), next_node
+                            ))
                     # mark if target is found
-                    if list(next_node) in targets:
-                        target_found = True
-                        single_target_node = next_node
+                    if next_node in target_nodes:
+                        target_node = next_node
                         break
+                if target_node is not None:
+                    break
 
             # exit the while loop if the target is found
-            if target_found:
-                continue
-            # mark node already evaluates as done and removed from the list
-            self.maps[self.Page.nstatus2][tuple(curr_node)] = self.nstatus["done"]
-            for idx,node in enumerate(open_nodes):
-                if node == curr_node:
-                    open_nodes.pop(idx)
-
-            # populate node(s) with the lowest f_cost 
-            min_f_nodes = []
-            for node in open_nodes:
-                f_cost = self.maps[self.Page.f2][tuple(node)]
-                h_cost = self.maps[self.Page.h2][tuple(node)]
-                if not min_f_nodes:
-                    min_f_nodes.append({"node":node, "f_cost": f_cost, "h_cost": h_cost})
-                else:
-                    if f_cost < min_f_nodes[0]["f_cost"]:
-                        min_f_nodes.clear()
-                        min_f_nodes.append({"node":node, "f_cost": f_cost, "h_cost": h_cost})
-                    elif f_cost == min_f_nodes[0]["f_cost"]:
-                        if h_cost < min_f_nodes[0]["h_cost"]:
-                            min_f_nodes.clear()
-                            min_f_nodes.append({"node":node, "f_cost": f_cost, "h_cost": h_cost})
-                        elif h_cost == min_f_nodes[0]["h_cost"]:
-                            min_f_nodes.append({"node":node, "f_cost": f_cost, "h_cost": h_cost})
-            # choose one node randomly if several nodes having same low f_cost
-            curr_node = random.choice(min_f_nodes)["node"]
+            if target_node is not None:
+                break
+            # mark node already evaluated as done
+            status[curr_node] = done
+
+            # pop the node with the lowest f_cost, h_cost and random tie-break.
+            # Entries of nodes which are done or got a lower g_cost later on
+            # are stale and skipped.
+            while True:
+                if not open_nodes:
+                    if self.logger:
+                        self.logger.debug(f"No path from {start} to {targets}")
+                    self.count_search(pushed)
+                    return 0
+                f_cost, _, _, curr_node = heapq.heappop(open_nodes)
+                if (status[curr_node] == opened
+                        and f_cost == g_cost[curr_node] + h_cost[curr_node]):
+                    break
 
         # Nodes expanded until target node. Now backtrack the path from the  
         # target to the start by checking respective parent node and create a 
         # final path from the start to the target.
-        path = []
-        parent_node = single_target_node
-        path.append(parent_node)
-        timestep = 0
-        while True:
-            parent_node = parents[tuple(parent_node)]
-            path.insert(0,parent_node)
-            if parent_node == start:
-                break
-            timestep += 1
-        
-        # convert path to final list of tuple containing rotation and movement.
-        # This final list is stored as robots attribute.
+        path = [target_node]
+        while path[-1] != start_node:
+            path.append(parents[path[-1]])
+        path = [list(divmod(node, self.maze_dim)) for node in reversed(path)]
+
+        self.build_timesteps(path, heading)
+        self.plan_cache.put(key, tuple(self.timesteps))
+        self.count_search(pushed)
+
+        #return number of timesteps for the optimal path
+        return len(self.timesteps)
+
+    def count_search(self, pushed):
+        '''
+        Add the nodes expanded by the last search which was not cached to
+        the total and the stats, on every exit of find_best_path.
+        '''
+        self.expanded_total += self.expanded
+        if self.stats is not None:
+            self.stats.add_search("path", self.expanded, pushed)
+
+    def find_cost_map(self, start):
+        '''
+        Sweep from a start to every node reachable given actual knowledge of 
+        the maze. A straight move of up to max_move nodes takes one timestep in
+        any direction, as backward movements need no rotation, so the sweep is
+        a breadth-first search independent of the robot heading. An array 
+        containing the timesteps to each node is returned, unreachable nodes 
+        are set to self.unreachable. Parents of the sweep are kept in the 
+        search buffer so that extract_plan can provide the path to any node.
+        '''
+
+        if self.stats is not None:
+            self.stats.calls += 1
+
+        start_node = self.flat_index(start)
+        runs = self.runs.reshape(4, -1).tolist()
+        cost = self.search_g
+        parents = self.search_parent
+        cost[:] = self.search_unreached
+
+        cost[start_node] = 0
+        queue = [start_node]
+        # nodes are appended in the order of their timesteps, so each node is 
+        # reached the first time with its lowest number of timesteps
+        for curr_node in queue:
+            cost_next = cost[curr_node] + 1
+            for direction, step in self.search_steps.items():
+                distance = min(runs[self.dir_index[direction]][curr_node], self.max_move)
+                next_node = curr_node
+                for i in range(distance):
+                    next_node += step
+                    if cost[next_node] > cost_next:
+                        cost[next_node] = cost_next
+                        parents[next_node] = curr_node
+                        queue.append(next_node)
+
+        # every node is queued once and expanded when dequeued
+        if self.stats is not None:
+            self.stats.add_search("sweep", len(queue), len(queue) - 1)
+
+        return np.array(cost).reshape(self.maze_dim, self.maze_dim)
+
+    def extract_plan(self, start, heading, target):
+        '''
+        Function to backtrack the path from the target to the start of the 
+        last find_cost_map sweep. The path of movement and rotation is stored 
+        as robots attribute self.timesteps and its number of timesteps is 
+        returned.
+        '''
+
+        start_node = self.flat_index(start)
+        path = [self.flat_index(target)]
+        while path[-1] != start_node:
+            path.append(self.search_parent[path[-1]])
+        path = [list(divmod(node, self.maze_dim)) for node in reversed(path)]
+
+        self.timesteps = []
+        self.build_timesteps(path, heading)
+
+        return len(self.timesteps)
+
+    def build_timesteps(self, path, heading):
+        '''
+        Function to convert path to final list of tuple containing rotation and
+        movement. This final list is stored as robots attribute.
+        '''
+
+        curr_heading = heading
         for idx,node in enumerate(path[:-1]):
             next_node = path[idx+1]
             direction, movement = self.get_head_mov(next_node,node)
@@ -430,9 +894,16 @@ class Robot(object):
                 movement = - movement
                 curr_heading = self.dir_reverse[direction]
             self.timesteps.append((rotation, movement,curr_heading, next_node))
-            
-        #return number of timesteps for the optimal path
-        return len(self.timesteps)
+
+        return
+
+    def flat_index(self, node):
+        '''
+        Function to convert a node given as [x, y] to its flat index in the 
+        search buffers.
+        '''
+
+        return int(node[0]) * self.maze_dim + int(node[1])
 
 
     def dist_to_wall(self, node, heading):
@@ -443,19 +914,32 @@ class Robot(object):
         'up', 'right', 'down', 'left'.
         """
 
-        sensing = True
-        distance = 0
-        curr_node = node.copy() # make copy to preserve original
-        while sensing:
-            # check if  permissible 
-            if self.maps[self.Page.walls][tuple(curr_node)] & self.dir_int[heading] != 0:
-                distance += 1
-                curr_node[0] += self.dir_move[heading][0]
-                curr_node[1] += self.dir_move[heading][1]
-            else:
-                sensing = False
+        return int(self.runs[self.dir_index[heading]][tuple(node)])
+
+    def update_runs(self, node, heading):
+        '''
+        Function to update the number of open nodes to the nearest wall after
+        the wall of the node in the given heading is opened. Only the node 
+        and the nodes behind it which have an open run through it change.
+        '''
 
-        return distance
+        runs = self.runs[self.dir_index[heading]]
+        wall_bit = self.dir_int[heading]
+        step_x, step_y = self.dir_move[heading]
+        x, y = node
+        # new run of the node continues with the run of its adjacent node
+        run = runs[x + step_x, y + step_y] + 1
+        while True:
+            runs[x, y] = run
+            x -= step_x
+            y -= step_y
+            if not (0 <= x < self.maze_dim and 0 <= y < self.maze_dim):
+                break
+            if self.maps[self.Page.walls][x, y] & wall_bit == 0:
+                break
+            run += 1
+
+        return
 
     def get_head_mov(self, target, start):
         '''
@@ -486,17 +970,12 @@ class Robot(object):
 
     def reset_pathfinder_maps(self):
         '''
-        Function to re-initialize some attributes like heuristic, g_cost and  
-        f_cost, timesteps required for A search to be performed.
-        '''
-        # reset heuristic table for A*
-        self.maps[self.Page.h2].fill(0)
-        # reset g_cost table for A*
-        self.maps[self.Page.g2].fill(0)
-        # reset f_cost table for A*
-        self.maps[self.Page.f2].fill(0)
-        # reset node status table for A*
-        self.maps[self.Page.nstatus2].fill(False)
+        Function to re-initialize some attributes like node status and 
+        timesteps required for A search to be performed.
+        '''
+        # reset node status buffer for A*, g_cost and parent buffers are only
+        # read for nodes which are not closed so they need no reset
+        self.search_status[:] = self.search_closed
         # reset timesteps 
         self.timesteps = []
         self.timesteps_counter = 0
@@ -1,4 +1,4 @@
-from maze import Maze
+from maze import Maze, wall_segments
 import turtle
 import sys
 
@@ -22,37 +22,11 @@ if __name__ == '__main__':
     sq_size = 20
     origin = testmaze.dim * sq_size / -2
 
-    # iterate through squares one by one to decide where to draw walls
-    for x in range(testmaze.dim):
-        for y in range(testmaze.dim):
-            if not testmaze.is_permissible([x,y], 'up'):
-                wally.goto(origin + sq_size * x, origin + sq_size * (y+1))
-                wally.setheading(0)
-                wally.pendown()
-                wally.forward(sq_size)
-                wally.penup()
-
-            if not testmaze.is_permissible([x,y], 'right'):
-                wally.goto(origin + sq_size * (x+1), origin + sq_size * y)
-                wally.setheading(90)
-                wally.pendown()
-                wally.forward(sq_size)
-                wally.penup()
-
-            # only check bottom wall if on lowest row
-            if y == 0 and not testmaze.is_permissible([x,y], 'down'):
-                wally.goto(origin + sq_size * x, origin)
-                wally.setheading(0)
-                wally.pendown()
-                wally.forward(sq_size)
-                wally.penup()
-
-            # only check left wall if on leftmost column
-            if x == 0 and not testmaze.is_permissible([x,y], 'left'):
-                wally.goto(origin, origin + sq_size * y)
-                wally.setheading(90)
-                wally.pendown()
-                wally.forward(sq_size)
-                wally.penup()
+    # draw the walls merged into straight runs, one line per run
+    for x0, y0, x1, y1 in wall_segments(testmaze.walls).tolist():
+        wally.goto(origin + sq_size * x0, origin + sq_size * y0)
+        wally.pendown()
+        wally.goto(origin + sq_size * x1, origin + sq_size * y1)
+        wally.penup()
 
     window.exitonclick()
\ No newline at end of file
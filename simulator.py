@@ -0,0 +1,334 @@
+from dataclasses import dataclass
+from typing import Optional
+import numpy as np
+from trajectory import make_trace
+
+# heading names, moving vectors and heading index changes per rotation. The
+# heading index is used for the sensor and move tables of the maze.
+headings = ['up', 'right', 'down', 'left']
+heading_move = [(0, 1), (1, 0), (0, -1), (-1, 0)]
+rotations = {-90: -1, 0: 0, 90: 1}
+
+# test and score parameters
+max_time = 1000
+train_score_mult = 1/30.
+
+
+@dataclass
+class TrialResult:
+    '''
+    Result of a trial over run1 and run2. Timesteps and score are None for
+    runs which were not completed, coverage is the percentage of nodes
+    visited and visits holds the number of visits per node. trace holds the
+    trajectory arrays of trajectory.make_trace if the trial was recorded.
+    '''
+    run1: Optional[int]
+    run2: Optional[int]
+    score: Optional[float]
+    coverage: Optional[float]
+    visits: np.ndarray
+    trace: Optional[dict] = None
+
+    @property
+    def completed(self):
+        return self.run2 is not None
+
+
+def trial_result(runtimes, visits, train_score_mult=train_score_mult, trace=None):
+    '''
+    Returns the TrialResult of the runtimes of the completed runs, the table
+    of visits and the optional trace.
+    '''
+    if len(runtimes) < 2:
+        return TrialResult(runtimes[0] if runtimes else None, None, None, None, visits, trace)
+
+    score = round(runtimes[1] + train_score_mult * runtimes[0], 2)
+    # coverage as percentage of nodes visited
+    coverage = round((int(np.count_nonzero(visits)) / visits.size) * 100, 1)
+
+    return TrialResult(runtimes[0], runtimes[1], score, coverage, visits, trace)
+
+
+def print_event(event, data):
+    '''
+    Event hook printing the messages of the simulator like tester.py.
+    '''
+    if 'message' in data:
+        print(data['message'])
+
+
+class Simulator(object):
+    '''
+    This class runs a robot on a maze for run1 and run2 without any output.
+    Messages and robot movements are passed to the optional event hook
+    on_event(event, data) where event is one of 'run_start', 'step', 'reset',
+    'error', 'move', 'goal', 'timeout' and 'complete' and data is a dict
+    which contains a 'message' for all events printed by tester.py.
+    '''
+
+    def __init__(self, maze, robot_factory, max_time=max_time,
+                 train_score_mult=train_score_mult, strict=False,
+                 on_event=None, record=False):
+        '''
+        Object instantiation requires the maze and a factory creating a
+        robot for a given maze dimension, e.g. the Robot class. With strict
+        set a run is aborted on invalid rotation or movement like in
+        alg_tester.py instead of ignoring the rotation or limiting the
+        movement like in tester.py. With record set every move is kept and
+        returned as the trace of the TrialResult.
+        '''
+
+        self.maze = maze
+        self.robot_factory = robot_factory
+        self.max_time = max_time
+        self.train_score_mult = train_score_mult
+        self.strict = strict
+        self.on_event = on_event
+        self.record = record
+
+        # goal area in the center of the maze
+        self.goal_bounds = (self.maze.dim // 2 - 1, self.maze.dim // 2)
+
+    def emit(self, event, **data):
+        '''
+        Pass the event to the event hook if any.
+        '''
+        if self.on_event is not None:
+            self.on_event(event, data)
+
+    def run(self):
+        '''
+        Run a new robot for run1 and run2 and return the TrialResult.
+        '''
+
+        maze = self.maze
+        robot = self.robot_factory(maze.dim)
+        on_event = self.on_event
+        visits = np.zeros((maze.dim, maze.dim), dtype=int)
+        sensors = maze.sensors
+        moves = maze.moves
+        # moves as (x, y, heading, run, turn, movement) if recorded
+        steps = [] if self.record else None
+
+        # Record robot performance over two runs.
+        runtimes = []
+        total_time = 0
+        for run in range(2):
+            if on_event:
+                self.emit('run_start', run=run, message="Starting run {}.".format(run))
+
+            # Set the robot in the start position. Note that robot position
+            # parameters are independent of the robot itself.
+            x, y = 0, 0
+            heading = 0
+            visits[0, 0] = 1
+
+            hit_goal = False
+            while True:
+                # check for end of time
+                total_time += 1
+                if total_time > self.max_time:
+                    if on_event:
+                        self.emit('timeout', run=run, message="Allotted time exceeded.")
+                    break
+
+                if on_event:
+                    self.emit('step', run=run, location=[x, y], heading=headings[heading])
+
+                # provide robot with sensor information, get actions
+                sensing = sensors[x, y, heading].tolist()
+                rotation, movement = robot.next_move(sensing)
+
+                # check for a reset
+                if (rotation, movement) == ('Reset', 'Reset'):
+                    if run == 0 and hit_goal:
+                        runtimes.append(total_time)
+                        if on_event:
+                            self.emit('reset', run=run, message="Ending first run. Starting next run.")
+                        break
+                    elif run == 0 and not hit_goal:
+                        if on_event:
+                            self.emit('error', run=run, message="Cannot reset - robot has not hit goal yet.")
+                        continue
+                    else:
+                        if on_event:
+                            self.emit('error', run=run, message="Cannot reset on runs after the first.")
+                        continue
+
+                # perform rotation
+                turn = rotations.get(rotation, 0)
+                if rotation in rotations:
+                    heading = (heading + turn) % 4
+                else:
+                    if on_event:
+                        self.emit('error', run=run, message="Invalid rotation value, no rotation performed.")
+                    if self.strict:
+                        break
+
+                # perform movement, the move table holds the number of cells
+                # travelled before hitting a wall
+                if abs(movement) > 3:
+                    if on_event:
+                        self.emit('error', run=run, message="Movement limited to three squares in a turn.")
+                    if self.strict:
+                        break
+                movement = max(min(int(movement), 3), -3) # fix to range [-3, 3]
+                travelled = int(moves[x, y, heading, movement + 3])
+                x += heading_move[heading][0] * travelled
+                y += heading_move[heading][1] * travelled
+                if travelled != movement and on_event:
+                    self.emit('error', run=run, message="Movement stopped by wall.")
+
+                # update number of visits
+                visits[x, y] += 1
+                if steps is not None:
+                    steps.append((x, y, heading, run, turn, movement))
+                if on_event:
+                    self.emit('move', run=run, location=[x, y], heading=headings[heading],
+                              visits=int(visits[x, y]))
+
+                # check for goal entered
+                if x in self.goal_bounds and y in self.goal_bounds:
+                    hit_goal = True
+                    if run != 0:
+                        runtimes.append(total_time - sum(runtimes))
+                        if on_event:
+                            self.emit('goal', run=run, message="Goal found; run {} completed!".format(run))
+                        break
+
+        # Report score if robot is successful.
+        if on_event and len(runtimes) == 2:
+            score = runtimes[1] + self.train_score_mult * runtimes[0]
+            self.emit('complete', score=score, message="Task complete! Score: {:4.3f}".format(score))
+
+        trace = make_trace(steps) if steps is not None else None
+        return trial_result(runtimes, visits, self.train_score_mult, trace)
+
+
+class BatchSimulator(object):
+    '''
+    This class runs a batch of robots on the same maze in lockstep. Position,
+    heading, timesteps and goal flags of all trials are kept in arrays so
+    sensing, moving and goal checks are done for all active trials at once
+    from the sensor and move tables of the maze. Only next_move is called for each
+    robot. Results are the same as running each robot with Simulator, but
+    there are no events.
+    '''
+
+    # moving vector per heading index in the order up, right, down, left
+    heading_move = np.array(heading_move)
+
+    def __init__(self, maze, robot_factories, max_time=max_time,
+                 train_score_mult=train_score_mult, strict=False):
+        '''
+        Object instantiation requires the maze and a list of robot factories,
+        one per trial, e.g. [Robot] * 100 or lambdas passing different seeds.
+        strict behaves like in Simulator.
+        '''
+
+        self.maze = maze
+        self.robot_factories = list(robot_factories)
+        self.max_time = max_time
+        self.train_score_mult = train_score_mult
+        self.strict = strict
+
+        # goal area in the center of the maze
+        self.goal_bounds = np.array([self.maze.dim // 2 - 1, self.maze.dim // 2])
+
+    def run(self):
+        '''
+        Run a new robot of each factory for run1 and run2 and return the list
+        of TrialResults in the order of the factories.
+        '''
+
+        maze = self.maze
+        n = len(self.robot_factories)
+        robots = [factory(maze.dim) for factory in self.robot_factories]
+        visits = np.zeros((n, maze.dim, maze.dim), dtype=int)
+        runtimes = [[] for i in range(n)]
+
+        # state of each trial, run is 2 once a trial is finished
+        x = np.zeros(n, dtype=int)
+        y = np.zeros(n, dtype=int)
+        heading = np.zeros(n, dtype=int)
+        run = np.zeros(n, dtype=int)
+        total_time = np.zeros(n, dtype=int)
+        hit_goal = np.zeros(n, dtype=bool)
+        visits[:, 0, 0] = 1
+
+        def end_run(i):
+            '''
+            End the current run of a trial and set it to the start position
+            if there is another run.
+            '''
+            run[i] += 1
+            if run[i] < 2:
+                x[i] = y[i] = heading[i] = 0
+                hit_goal[i] = False
+                visits[i, 0, 0] = 1
+
+        while True:
+            active = np.flatnonzero(run < 2)
+            if not len(active):
+                break
+
+            # check for end of time
+            total_time[active] += 1
+            for i in active[total_time[active] > self.max_time]:
+                end_run(i)
+            active = active[total_time[active] <= self.max_time]
+
+            # sensor information of all active trials, left, front and right
+            sensing = maze.sensors[x[active], y[active], heading[active]].tolist()
+
+            # get actions of each robot
+            moving = []
+            turns = []
+            movements = []
+            for i, sensing_i in zip(active.tolist(), sensing):
+                rotation, movement = robots[i].next_move(sensing_i)
+
+                # check for a reset
+                if (rotation, movement) == ('Reset', 'Reset'):
+                    if run[i] == 0 and hit_goal[i]:
+                        runtimes[i].append(int(total_time[i]))
+                        end_run(i)
+                    continue
+
+                # invalid rotation or movement
+                if rotation not in rotations:
+                    if self.strict:
+                        end_run(i)
+                        continue
+                    rotation = 0
+                if abs(movement) > 3 and self.strict:
+                    end_run(i)
+                    continue
+
+                moving.append(i)
+                turns.append(rotations[rotation])
+                movements.append(max(min(int(movement), 3), -3))
+
+            if not moving:
+                continue
+            moving = np.array(moving)
+            movements = np.array(movements)
+
+            # perform rotation and movement up to the nearest wall
+            heading[moving] = (heading[moving] + turns) % 4
+            travelled = maze.moves[x[moving], y[moving], heading[moving], movements + 3]
+            x[moving] += self.heading_move[heading[moving], 0] * travelled
+            y[moving] += self.heading_move[heading[moving], 1] * travelled
+
+            # update number of visits
+            visits[moving, x[moving], y[moving]] += 1
+
+            # check for goal entered
+            in_goal = np.isin(x[moving], self.goal_bounds) & np.isin(y[moving], self.goal_bounds)
+            hit_goal[moving[in_goal]] = True
+            for i in moving[in_goal & (run[moving] == 1)]:
+                runtimes[i].append(int(total_time[i]) - sum(runtimes[i]))
+                end_run(i)
+
+        return [trial_result(runtimes[i], visits[i], self.train_score_mult)
+                for i in range(n)]
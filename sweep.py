@@ -0,0 +1,112 @@
+import os
+import zlib
+import functools
+from concurrent.futures import ProcessPoolExecutor
+from maze import Maze
+from robot import Robot
+from simulator import Simulator, max_time, train_score_mult
+
+# mazes loaded by this process, reused by all trials on the same maze
+mazes = {}
+# trial caches of this process per directory, keeping track of their size
+caches = {}
+
+
+def trial_seed(maze, alg, attempt, base_seed=0):
+    '''
+    Returns the seed of a trial which only depends on the maze file, run1
+    algorithm, attempt number and base seed, so results do not depend on the
+    worker or the order a trial is executed in.
+    '''
+    key = "{}:{}:{}:{}".format(base_seed, maze, alg, attempt)
+    return zlib.crc32(key.encode())
+
+
+def run_trial(task, record=False):
+    '''
+    Run a single trial given as (maze, alg, attempt, seed, max_time,
+    train_score_mult, cache) and return its row [alg, attempt, maze, run1,
+    run2, score, coverage]. Run2, score and coverage are None if the robot
+    did not complete run2. cache is a TrialCache or None. With record set
+    (row, trace) is returned, recorded trials are not cached.
+    '''
+
+    maze, alg, attempt, seed, trial_max_time, trial_score_mult, cache = task
+    if maze not in mazes:
+        mazes[maze] = Maze(maze)
+
+    if record:
+        simulator = Simulator(mazes[maze], lambda dim: Robot(dim, alg, seed=seed),
+                              trial_max_time, trial_score_mult, strict=True, record=True)
+        result = simulator.run()
+        return [alg, attempt, maze, result.run1, result.run2, result.score, result.coverage], result.trace
+    elif cache is not None:
+        cache = caches.setdefault(cache.directory, cache)
+        result = cache.run(mazes[maze], alg, seed, trial_max_time, trial_score_mult)
+    else:
+        simulator = Simulator(mazes[maze], lambda dim: Robot(dim, alg, seed=seed),
+                              trial_max_time, trial_score_mult, strict=True)
+        result = simulator.run()
+
+    return [alg, attempt, maze, result.run1, result.run2, result.score, result.coverage]
+
+
+def sweep_tasks(mazefiles, algs, attempts, base_seed=0, max_time=max_time,
+                train_score_mult=train_score_mult, cache=None):
+    '''
+    Returns the trials of a sweep in the order of the serial loop of
+    alg_tester.py, i.e. maze, algorithm and attempt starting at 1. Results
+    are looked up in and added to the TrialCache cache if given.
+    '''
+    return [
+        (maze, alg, attempt, trial_seed(maze, alg, attempt, base_seed),
+         max_time, train_score_mult, cache)
+        for maze in mazefiles
+        for alg in algs
+        for attempt in range(1, attempts + 1)
+    ]
+
+
+def iter_sweep(tasks, workers=None, chunksize=None, record=False):
+    '''
+    Run the trials of tasks on a pool of worker processes and yield (task,
+    row) in task order as soon as they are available. workers defaults to
+    the number of CPUs, trials are dispatched in chunks of chunksize which
+    defaults to about four chunks per worker. With record set (task, row,
+    trace) is yielded.
+    '''
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(tasks)))
+    if chunksize is None:
+        chunksize = max(1, len(tasks) // (workers * 4))
+
+    trial = functools.partial(run_trial, record=record)
+
+    # no pool for a single worker
+    if workers == 1:
+        for task in tasks:
+            result = trial(task)
+            yield (task,) + result if record else (task, result)
+        return
+
+    # map returns results in task order whatever worker finishes first
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for task, result in zip(tasks, executor.map(trial, tasks, chunksize=chunksize)):
+            yield (task,) + result if record else (task, result)
+
+
+def parallel_sweep(mazefiles, algs, attempts, workers=None, chunksize=None,
+                   base_seed=0, max_time=max_time,
+                   train_score_mult=train_score_mult, cache=None):
+    '''
+    Run all combinations of mazes, algorithms and attempts on a pool of
+    worker processes, see iter_sweep, and return the rows of the completed
+    trials in sweep order.
+    '''
+
+    tasks = sweep_tasks(mazefiles, algs, attempts, base_seed, max_time,
+                        train_score_mult, cache)
+    return [row for task, row in iter_sweep(tasks, workers, chunksize)
+            if row[4] is not None]
@@ -0,0 +1,127 @@
+import os
+import numpy as np
+
+# fields of a trace and their types, one entry per move of the robot: the
+# position and heading after the move, the run, the rotation as -1, 0 or 1
+# quarter turns and the movement requested by the robot
+trace_fields = [('x', np.int16), ('y', np.int16), ('heading', np.int8),
+                ('run', np.int8), ('rotation', np.int8), ('movement', np.int8)]
+
+# outcome of a trial stored next to its trace, missing values are stored
+# as -1 or nan
+meta_fields = ['maze', 'alg', 'attempt', 'seed', 'run1', 'run2', 'score', 'coverage']
+
+
+def make_trace(steps):
+    '''
+    Returns the trace of a list of moves (x, y, heading, run, rotation,
+    movement) as a dict of one array per field.
+    '''
+    table = np.array(steps, dtype=np.int16).reshape(-1, len(trace_fields))
+    return {name: table[:, i].astype(dtype) for i, (name, dtype) in enumerate(trace_fields)}
+
+
+class TraceWriter(object):
+    '''
+    Collects the traces of many trials and saves them in a single compressed
+    .npz file. The arrays of all trials are concatenated, trial i covers the
+    moves offsets[i] to offsets[i + 1]. With resume set the trials of an
+    existing file are kept.
+    '''
+
+    def __init__(self, filename, resume=False):
+        self.filename = filename
+        self.traces = []
+        self.meta = []
+        if resume and os.path.exists(filename):
+            traces = TraceFile(filename)
+            for i in range(len(traces)):
+                trial = traces.trial(i)
+                self.traces.append({name: trial[name] for name, _ in trace_fields})
+                self.meta.append([trial[name] for name in meta_fields])
+
+    def add(self, trace, row, seed=None):
+        '''
+        Add the trace of a trial with its row [alg, attempt, maze, run1,
+        run2, score, coverage] like the rows of the results.
+        '''
+        alg, attempt, maze, run1, run2, score, coverage = row
+        self.traces.append(trace)
+        self.meta.append([maze, alg, attempt, seed, run1, run2, score, coverage])
+
+    def save(self):
+        '''
+        Write all traces to the file.
+        '''
+        lengths = [len(trace['x']) for trace in self.traces]
+        arrays = {'offsets': np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)}
+        for name, dtype in trace_fields:
+            arrays[name] = np.concatenate([trace[name] for trace in self.traces]
+                                          + [np.zeros(0, dtype=dtype)])
+
+        def column(i, dtype, missing):
+            return np.array([missing if meta[i] is None else meta[i] for meta in self.meta], dtype=dtype)
+        arrays['maze'] = column(0, str, '')
+        arrays['alg'] = column(1, str, '')
+        arrays['attempt'] = column(2, np.int32, -1)
+        arrays['seed'] = column(3, np.int64, -1)
+        arrays['run1'] = column(4, np.int32, -1)
+        arrays['run2'] = column(5, np.int32, -1)
+        arrays['score'] = column(6, np.float64, np.nan)
+        arrays['coverage'] = column(7, np.float64, np.nan)
+
+        # written to a temporary file first, so an interrupted save keeps
+        # the previous file
+        tmp_file = self.filename + '.tmp'
+        with open(tmp_file, 'wb') as f_out:
+            np.savez_compressed(f_out, **arrays)
+        os.replace(tmp_file, self.filename)
+
+    def close(self):
+        self.save()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class TraceFile(object):
+    '''
+    Reads a trace file written by TraceWriter.
+    '''
+
+    def __init__(self, filename):
+        with np.load(filename) as data:
+            self.arrays = {name: data[name] for name in data.files}
+        self.offsets = self.arrays['offsets']
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def trial(self, index):
+        '''
+        Returns a dict of the trace arrays and the outcome of a trial.
+        Missing values of the outcome are None.
+        '''
+        start, end = self.offsets[index], self.offsets[index + 1]
+        trial = {name: self.arrays[name][start:end] for name, _ in trace_fields}
+        for name in meta_fields:
+            value = self.arrays[name][index].item()
+            if value in (-1, '') or value != value:
+                value = None
+            trial[name] = value
+        return trial
+
+    def find(self, maze=None, alg=None):
+        '''
+        Returns the indices of the trials of the maze and algorithm, all
+        trials if not given.
+        '''
+        selected = np.ones(len(self), dtype=bool)
+        if maze is not None:
+            selected &= self.arrays['maze'] == maze
+        if alg is not None:
+            selected &= self.arrays['alg'] == alg
+        return np.flatnonzero(selected).tolist()
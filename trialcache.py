@@ -0,0 +1,179 @@
+import os
+import json
+import hashlib
+import functools
+import numpy as np
+from robot import Robot
+from simulator import Simulator, TrialResult, max_time, train_score_mult
+
+# modules the outcome of a trial depends on
+fingerprint_modules = ['robot.py', 'planner.py', 'simulator.py', 'maze.py']
+
+
+@functools.lru_cache(maxsize=None)
+def code_fingerprint(modules=tuple(fingerprint_modules)):
+    '''
+    Returns a hash of the source of the modules a trial depends on, so
+    editing e.g. the animation or analysis code keeps cached results valid.
+    '''
+    digest = hashlib.sha256()
+    directory = os.path.dirname(os.path.abspath(__file__))
+    for module in modules:
+        with open(os.path.join(directory, module), 'rb') as f_in:
+            digest.update(module.encode())
+            digest.update(f_in.read())
+    return digest.hexdigest()
+
+
+class TrialCache(object):
+    '''
+    On-disk cache of trial results addressed by a hash of the maze walls,
+    run1 algorithm, seed, time and score parameters and the code fingerprint.
+    Each entry is a json file of the outcome, the table of visits is stored
+    in an additional .npy file if store_visits is set. Least recently used
+    entries other than the one just written are removed once the cache
+    exceeds max_bytes. With bypass set
+    nothing is read or written.
+    '''
+
+    def __init__(self, directory='.trial_cache', max_bytes=64 * 2**20,
+                 store_visits=False, bypass=False):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.store_visits = store_visits
+        self.bypass = bypass
+        self.hits = 0
+        self.misses = 0
+        # size of the cache, counted once and updated by put
+        self.size = None
+
+    def key(self, maze, alg, seed, max_time=max_time,
+            train_score_mult=train_score_mult, strict=True):
+        '''
+        Returns the key of a trial of a robot with the given seed.
+        '''
+        walls = np.ascontiguousarray(maze.walls, dtype=np.uint8)
+        digest = hashlib.sha256(walls.tobytes())
+        digest.update(json.dumps([walls.shape, alg, seed, max_time, train_score_mult,
+                                  strict, code_fingerprint()]).encode())
+        return digest.hexdigest()
+
+    def path(self, key, extension):
+        return os.path.join(self.directory, key[:2], key + extension)
+
+    def get(self, key):
+        '''
+        Returns the cached TrialResult of the key or None. visits is None if
+        the table of visits was not stored.
+        '''
+        if self.bypass:
+            return None
+        filename = self.path(key, '.json')
+        try:
+            with open(filename, 'r') as f_in:
+                entry = json.load(f_in)
+            visits = None
+            if os.path.exists(self.path(key, '.npy')):
+                visits = np.load(self.path(key, '.npy'))
+            # mark as recently used
+            os.utime(filename)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return TrialResult(entry['run1'], entry['run2'], entry['score'], entry['coverage'], visits)
+
+    def put(self, key, result):
+        '''
+        Store the TrialResult of the key and evict old entries if the cache
+        became too large.
+        '''
+        if self.bypass:
+            return
+        filename = self.path(key, '.json')
+        entry = {'run1': result.run1, 'run2': result.run2,
+                 'score': result.score, 'coverage': result.coverage}
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        # written to a temporary file first, so parallel workers never read
+        # a partial entry
+        tmp_file = '{}.{}.tmp'.format(filename, os.getpid())
+        with open(tmp_file, 'w') as f_out:
+            json.dump(entry, f_out)
+        os.replace(tmp_file, filename)
+        added = os.path.getsize(filename)
+        if self.store_visits and result.visits is not None:
+            with open(tmp_file, 'wb') as f_out:
+                np.save(f_out, result.visits.astype(np.int32))
+            os.replace(tmp_file, self.path(key, '.npy'))
+            added += os.path.getsize(self.path(key, '.npy'))
+
+        if self.size is None:
+            self.size = sum(size for _, size, _ in self.entries())
+        else:
+            self.size += added
+        if self.size > self.max_bytes:
+            self.evict(keep=key)
+
+    def entries(self):
+        '''
+        Returns a list of (key, size, last use) of all cached entries.
+        '''
+        entries = []
+        if not os.path.isdir(self.directory):
+            return entries
+        for subdir in os.scandir(self.directory):
+            if not subdir.is_dir():
+                continue
+            for entry in os.scandir(subdir.path):
+                if not entry.name.endswith('.json'):
+                    continue
+                key = entry.name[:-len('.json')]
+                stat = entry.stat()
+                size = stat.st_size
+                if os.path.exists(self.path(key, '.npy')):
+                    size += os.path.getsize(self.path(key, '.npy'))
+                entries.append((key, size, stat.st_mtime))
+        return entries
+
+    def evict(self, keep=None):
+        '''
+        Remove the least recently used entries until the cache is below
+        three quarters of max_bytes. The entry keep, i.e. the one just
+        written, is never removed, so an entry larger than the limit stays
+        cached on its own until the next entry is written.
+        '''
+        entries = sorted(self.entries(), key=lambda entry: entry[2])
+        self.size = sum(size for _, size, _ in entries)
+        for key, size, _ in entries:
+            if self.size <= self.max_bytes * 3 // 4:
+                break
+            if key == keep:
+                continue
+            for extension in ('.json', '.npy'):
+                try:
+                    os.remove(self.path(key, extension))
+                except OSError:
+                    pass
+            self.size -= size
+
+    def run(self, maze, alg, seed, max_time=max_time,
+            train_score_mult=train_score_mult, strict=True, on_event=None):
+        '''
+        Returns the cached TrialResult of a Robot with the given alg and seed
+        or runs the trial with Simulator and caches it. Trials without a
+        seed are not reproducible and always run. on_event is passed to the
+        Simulator whenever the trial runs, a cached trial emits no events.
+        '''
+        if self.bypass or seed is None:
+            return Simulator(maze, lambda dim: Robot(dim, alg, seed=seed),
+                             max_time, train_score_mult, strict=strict,
+                             on_event=on_event).run()
+
+        key = self.key(maze, alg, seed, max_time, train_score_mult, strict)
+        result = self.get(key)
+        if result is None:
+            result = Simulator(maze, lambda dim: Robot(dim, alg, seed=seed),
+                               max_time, train_score_mult, strict=strict,
+                               on_event=on_event).run()
+            self.put(key, result)
+        return result